@@ -0,0 +1,185 @@
+"""
+Keyset pagination over PostgREST tables.
+
+Shared by the scraper and predictor/data/export.py, so it depends on `requests` only.
+Pages are requested as `<key>=gt.<last key>` ordered by the primary key: every page is
+an index range scan, where growing OFFSETs make Postgres scan and discard every earlier
+row. Paging stops on an empty page rather than a short one, so a server-side row cap
+(PostgREST db-max-rows) cannot silently truncate the result.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import uuid
+from typing import Iterator, Optional
+
+import requests
+
+DEFAULT_PAGE_SIZE = 1000
+# Pages each concurrent key range may fetch ahead of the consumer
+PREFETCH_PAGES = 2
+
+
+def _page(
+    http,
+    url: str,
+    headers: dict,
+    table: str,
+    params: list[tuple[str, str]],
+    timeout: int,
+) -> list[dict]:
+    resp = http.get(f"{url}/rest/v1/{table}", headers=headers, params=params, timeout=timeout)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _keyset_pages(
+    http,
+    url: str,
+    headers: dict,
+    table: str,
+    *,
+    key: str,
+    select: str,
+    page_size: int,
+    filters: list[tuple[str, str]],
+    after: Optional[str] = None,
+    start: Optional[str] = None,
+    before: Optional[str] = None,
+    timeout: int = 60,
+) -> Iterator[list[dict]]:
+    """Pages of rows with after < key (or start <= key) and key < before, in key order."""
+    bound = [(key, f"lt.{before}")] if before is not None else []
+    while True:
+        params = [("select", select), ("order", f"{key}.asc"), ("limit", str(page_size))]
+        params += filters + bound
+        if after is not None:
+            params.append((key, f"gt.{after}"))
+        elif start is not None:
+            params.append((key, f"gte.{start}"))
+        batch = _page(http, url, headers, table, params, timeout)
+        if not batch:
+            return
+        yield batch
+        after = batch[-1][key]
+
+
+class _Prefetch:
+    """Pages of one key range fetched on a background thread, at most `depth` ahead."""
+
+    _DONE = object()
+
+    def __init__(self, pages: Iterator[list[dict]], depth: int) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        threading.Thread(target=self._run, args=(pages,), daemon=True).start()
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, pages: Iterator[list[dict]]) -> None:
+        try:
+            for page in pages:
+                if not self._put(page):
+                    return
+            self._put(self._DONE)
+        except Exception as exc:  # re-raised on the consumer's thread
+            self._put(exc)
+
+    def __iter__(self) -> Iterator[list[dict]]:
+        while True:
+            item = self._queue.get()
+            if item is self._DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def close(self) -> None:
+        self._stop.set()
+
+
+def _uuid_bounds(after: str, parts: int) -> list[str]:
+    """Split the uuid key space above `after` into `parts` contiguous ranges."""
+    low = uuid.UUID(after).int
+    span = (1 << 128) - low
+    return [str(uuid.UUID(int=low + span * i // parts)) for i in range(1, parts)]
+
+
+def _is_uuid(value) -> bool:
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+def iter_keyset_pages(
+    url: str,
+    headers: dict,
+    table: str,
+    *,
+    key: str = "id",
+    select: str = "*",
+    page_size: int = DEFAULT_PAGE_SIZE,
+    filters: Optional[list[tuple[str, str]]] = None,
+    workers: int = 1,
+    session: Optional[requests.Session] = None,
+    timeout: int = 60,
+) -> Iterator[list[dict]]:
+    """
+    Pages of `table` (matching `filters`) in primary-key order.
+
+    With `workers > 1` and a uuid key, the key space after the first page is split into
+    `workers` ranges paged concurrently, each at most PREFETCH_PAGES ahead, and yielded
+    in range order — the same pages as the sequential walk, in bounded memory.
+    """
+    http = session or requests
+    filters = list(filters or [])
+    if select != "*" and key not in [c.strip() for c in select.split(",")]:
+        select = f"{select},{key}"
+    base = dict(key=key, select=select, page_size=page_size, filters=filters, timeout=timeout)
+
+    params = [("select", select), ("order", f"{key}.asc"), ("limit", str(page_size))]
+    first = _page(http, url, headers, table, params + filters, timeout)
+    if not first:
+        return
+    yield first
+    last = first[-1][key]
+    if workers <= 1 or not _is_uuid(last):
+        yield from _keyset_pages(http, url, headers, table, after=last, **base)
+        return
+
+    # First range continues after the last key; the others start inclusively at a bound
+    bounds = _uuid_bounds(str(last), workers)
+    ranges = [{"after": str(last)}] + [{"start": b} for b in bounds]
+    for r, before in zip(ranges, bounds + [None]):
+        r["before"] = before
+    prefetched = [
+        _Prefetch(_keyset_pages(http, url, headers, table, **r, **base), PREFETCH_PAGES)
+        for r in ranges
+    ]
+    try:
+        for pages in prefetched:
+            yield from pages
+    finally:
+        for pages in prefetched:
+            pages.close()
+
+
+def fetch_keyset(
+    url: str,
+    headers: dict,
+    table: str,
+    **kwargs,
+) -> list[dict]:
+    """All rows of `table` in primary-key order (see iter_keyset_pages for options)."""
+    return [row for page in iter_keyset_pages(url, headers, table, **kwargs) for row in page]
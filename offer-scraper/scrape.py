@@ -56,6 +56,7 @@ import requests
 from dotenv import load_dotenv
 
 from browser import BrowserSession
+from postgrest_paging import fetch_keyset
 
 load_dotenv()
 
@@ -89,6 +90,9 @@ DB_FIELDS = [
 
 HISTORY_FIELDS = [f for f in DB_FIELDS if f != "last_updated"] + ["scraped_at"]
 
+# Rows per keyset page when reading Supabase tables
+SUPABASE_PAGE_SIZE = 1000
+
 
 def _supa_key() -> str:
     return os.environ.get("SUPABASE_KEY") or os.environ.get("SUPABASE_SERVICE_KEY", "")
@@ -311,17 +315,18 @@ def update_offer_metadata(
         )
 
 
-def fetch_current_offer(supa_url: str, supa_key: str) -> list[dict]:
+def fetch_current_offer(
+    supa_url: str, supa_key: str, page_size: int = SUPABASE_PAGE_SIZE
+) -> list[dict]:
+    """Whole course_offer table, keyset-paged by nrc (no server row-cap truncation)."""
     headers = _supabase_headers(supa_key)
-    resp = requests.get(
-        f"{supa_url}/rest/v1/course_offer?select=*",
-        headers=headers,
-        timeout=60,
-    )
-    if resp.status_code != 200:
-        log.error("Failed to fetch course_offer: %s", resp.text[:200])
+    try:
+        return fetch_keyset(
+            supa_url, headers, "course_offer", key="nrc", page_size=page_size
+        )
+    except requests.HTTPError as exc:
+        log.error("Failed to fetch course_offer: %s", exc.response.text[:200])
         return []
-    return resp.json()
 
 
 def archive_current_offer_to_history(supa_url: str, supa_key: str) -> int:
@@ -20,6 +20,19 @@ SUPABASE_KEY = (
     os.environ.get("SUPABASE_SERVICE_KEY", "").strip()
     or os.environ.get("SUPABASE_KEY", "").strip()
 )
+# Export paging: rows per request and concurrent requests (tables × page ranges)
+EXPORT_PAGE_SIZE = 1000
+EXPORT_WORKERS = 4
+# Export paging: "keyset" (<pk>=gt.<last>, offer-scraper/postgrest_paging.py) or "offset"
+EXPORT_PAGINATION = "keyset"
+# Export user_progress as per-course counts (get_predictor_platform_counts RPC) instead of
+# every user row; falls back to aggregating a raw dump when the function is not deployed
+EXPORT_PLATFORM_COUNTS = True
+# Also write typed Parquet twins of the JSON snapshots (data/columnar.py); needs pyarrow,
+# skipped without it. Loaders prefer a Parquet twin at least as new as its JSON
+EXPORT_COLUMNAR = True
+# Incremental export re-reads this far below each watermark (client-set updated_at may lag)
+EXPORT_WATERMARK_LOOKBACK_HOURS = 24
 
 # Aligned with frontend/lib/demandPrediction.ts and curriculumGraph.ts
 STUDENTS_PER_SECTION = 25
@@ -29,6 +42,9 @@ P_SAME_AREA = 0.5
 P_OTHER = 0.25
 MAX_DAG_HOPS = 5
 MIN_DAG_FLOW = 0.25
+# DAG propagation engine: "queue" (per-path BFS) or "matrix" (graph/propagation_matrix.py).
+# The queue is faster on today's sparse curricula; "matrix" stops cost growing with paths
+PROPAGATION_ENGINE = "queue"
 
 # Hybrid formula weights (students)
 W_EST_NEXT = 0.45
@@ -44,14 +60,26 @@ W_SEC_FROM_EST = 0.25
 W_SEC_INFLOW_HIST = 0.10
 W_SEC_INFLOW_CURS = 0.05
 
+# History aggregation engine: "python" (row loop) or "pandas" (columnar, features/history_frame.py)
+HISTORY_STATS_ENGINE = "python"
+
 # Legacy baseline (kept for reference)
 HIST_WEIGHT = 0.6
 PLANNED_WEIGHT = 0.4
 
 # Transition rate calibration (Bayesian shrinkage toward priors)
 TRANSITION_SHRINKAGE_ALPHA = 75.0
+# Candidate alphas for eval/alpha_sweep.py
+TRANSITION_ALPHA_GRID = (0.0, 10.0, 25.0, 50.0, 75.0, 100.0, 150.0, 250.0, 500.0)
 TRANSITION_RATE_MIN = 0.05
 TRANSITION_RATE_MAX = 0.95
 TRANSITION_RATES_JSON = OUTPUT_DIR / "transition_rates.json"
+# Raw RateAccumulator sums behind transition_rates.json (features/calibration_state.py)
+TRANSITION_ACCUMULATORS_JSON = OUTPUT_DIR / "transition_accumulators.json"
 PUBLIC_TRANSITION_RATES_JSON = REPO_ROOT / "frontend" / "public" / "data" / "transition_rates.json"
-PERIODS_JSON = REPO_ROOT / "offer-scraper" / "periods.json"
+# Calibration engine: "loop" (edge × period loop) or "matrix" (features/calibration_matrix.py)
+CALIBRATION_ENGINE = "loop"
+# offer-scraper/ is not a package: data/export.py imports postgrest_paging.py from it by
+# path (registered as sys.modules["postgrest_paging"]) on the first keyset export
+SCRAPER_DIR = REPO_ROOT / "offer-scraper"
+PERIODS_JSON = SCRAPER_DIR / "periods.json"
@@ -0,0 +1,253 @@
+"""
+Typed columnar (Parquet) snapshots of exported tables, next to the JSON ones.
+
+Course, curriculum and period codes are dictionary-encoded and counts are int32, so a
+snapshot is a fraction of the JSON size and loads with column projection. Optional:
+needs pyarrow; without it nothing is written and every loader reads the JSON snapshot.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+from config import OUTPUT_DIR
+from data.jsonrows import iter_json_rows
+
+# Rows per Parquet row group, and per batch when reading back
+COLUMNAR_BATCH_ROWS = 65536
+
+# Column → type per exported table (supabase/migrations); "code" is dictionary-encoded text
+COLUMNAR_SCHEMAS: dict[str, dict[str, str]] = {
+    "course_offer_history": {
+        "id": "text",
+        "nrc": "text",
+        "course_code": "code",
+        "title": "text",
+        "type": "code",
+        "section_letter": "code",
+        "days": "text_list",
+        "start_time": "text",
+        "end_time": "text",
+        "teacher": "text",
+        "available": "int",
+        "total": "int",
+        "period": "code",
+        "period_code": "code",
+        "scraped_at": "text",
+    },
+    "course_offer": {
+        "nrc": "text",
+        "course_code": "code",
+        "title": "text",
+        "type": "code",
+        "section_letter": "code",
+        "days": "text_list",
+        "start_time": "text",
+        "end_time": "text",
+        "teacher": "text",
+        "available": "int",
+        "total": "int",
+        "period": "code",
+        "period_code": "code",
+        "last_updated": "text",
+    },
+    "user_progress": {
+        "id": "text",
+        "user_id": "text",
+        "curriculum_id": "code",
+        "completed_courses": "text_list",
+        "in_progress_courses": "text_list",
+        "planned_courses": "text_list",
+        "has_writing_intensive": "bool",
+        "updated_at": "text",
+        "created_at": "text",
+    },
+    "platform_counts": {
+        "curriculum_id": "code",
+        "course_code": "code",
+        "in_progress": "int",
+        "planned": "int",
+    },
+}
+
+
+@lru_cache(maxsize=1)
+def has_columnar_engine() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def columnar_path(json_path: Path) -> Path:
+    return json_path.with_suffix(".parquet")
+
+
+def fresh_columnar_path(json_path: Path) -> Path | None:
+    """The Parquet twin of `json_path` when readable and at least as new as the JSON."""
+    path = columnar_path(json_path)
+    if not has_columnar_engine() or not path.exists():
+        return None
+    if json_path.exists() and path.stat().st_mtime < json_path.stat().st_mtime:
+        return None
+    return path
+
+
+def _text(value) -> str | None:
+    return None if value is None else str(value)
+
+
+def _int(value) -> int | None:
+    if value is None or value == "":
+        return None
+    return int(float(value))
+
+
+def _text_list(value) -> list[str] | None:
+    return [str(v) for v in value] if isinstance(value, list) else None
+
+
+def _bool(value) -> bool | None:
+    return None if value is None else bool(value)
+
+
+_COERCE = {"text": _text, "code": _text, "int": _int, "text_list": _text_list, "bool": _bool}
+
+
+def _arrow_schema(columns: dict[str, str]):
+    import pyarrow as pa
+
+    types = {
+        "text": pa.string(),
+        "code": pa.dictionary(pa.int32(), pa.string()),
+        "int": pa.int32(),
+        "text_list": pa.list_(pa.string()),
+        "bool": pa.bool_(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns.items()])
+
+
+def _record_batch(rows: list[dict], columns: dict[str, str], schema):
+    import pyarrow as pa
+
+    arrays = []
+    for name, kind in columns.items():
+        values = [_COERCE[kind](row.get(name)) for row in rows]
+        if kind == "code":
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, schema.field(name).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    chunk: list[dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_columnar_snapshot(json_path: Path, table: str | None = None) -> Path | None:
+    """
+    Parquet twin of a JSON snapshot, streamed one row group at a time. Returns None
+    (nothing written) without pyarrow or for a table with no columnar schema.
+    """
+    columns = COLUMNAR_SCHEMAS.get(table or json_path.stem)
+    if columns is None or not has_columnar_engine() or not json_path.exists():
+        return None
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(columns)
+    dest = columnar_path(json_path)
+    tmp = dest.with_name(dest.name + ".partial")
+    try:
+        with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+            for chunk in _chunks(iter_json_rows(json_path), COLUMNAR_BATCH_ROWS):
+                writer.write_batch(_record_batch(chunk, columns, schema))
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return dest
+
+
+def _column_values(column) -> list:
+    """Python values of one Arrow column; dictionary values are decoded once and shared."""
+    import pyarrow as pa
+
+    if pa.types.is_dictionary(column.type):
+        labels = column.dictionary.to_pylist()
+        return [None if i is None else labels[i] for i in column.indices.to_pylist()]
+    return column.to_pylist()
+
+
+def iter_columnar_rows(path: Path, columns: Sequence[str] | None = None) -> Iterator[dict]:
+    """Rows of a Parquet snapshot, projected to `columns`; null fields are left out."""
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path)
+    names = parquet.schema_arrow.names
+    wanted = names if columns is None else [c for c in columns if c in names]
+    for batch in parquet.iter_batches(batch_size=COLUMNAR_BATCH_ROWS, columns=wanted):
+        values = [_column_values(batch.column(i)) for i in range(batch.num_columns)]
+        for row in zip(*values):
+            yield {name: v for name, v in zip(wanted, row) if v is not None}
+
+
+def iter_table_rows(json_path: Path, columns: Sequence[str] | None = None) -> Iterator[dict]:
+    """Rows of an exported table: its fresh Parquet twin when available, else the JSON."""
+    path = fresh_columnar_path(json_path)
+    if path is not None:
+        yield from iter_columnar_rows(path, columns)
+    elif json_path.exists():
+        yield from iter_json_rows(json_path, columns)
+
+
+def write_columnar_snapshots(directory: Path | None = None) -> dict[str, Path]:
+    """Parquet twins for every exported JSON snapshot in `directory`."""
+    written = {}
+    for table in COLUMNAR_SCHEMAS:
+        path = write_columnar_snapshot((directory or OUTPUT_DIR) / f"{table}.json", table)
+        if path is not None:
+            written[table] = path
+    return written
+
+
+if __name__ == "__main__":
+    import tracemalloc
+
+    from features.history_stats import HISTORY_COLUMNS
+
+    parser = argparse.ArgumentParser(description="Write Parquet twins of exported snapshots")
+    parser.add_argument("--dir", type=Path, default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    if not has_columnar_engine():
+        raise SystemExit("pyarrow is not installed; loaders keep reading the JSON snapshots")
+    for table, path in write_columnar_snapshots(args.dir).items():
+        json_path = args.dir / f"{table}.json"
+        print(f"{table}: {json_path.stat().st_size:,} B JSON → {path.stat().st_size:,} B Parquet")
+
+    history = args.dir / "course_offer_history.json"
+    if history.exists():
+        for label, load in (
+            ("json", lambda: list(iter_json_rows(history, HISTORY_COLUMNS))),
+            ("parquet", lambda: list(iter_columnar_rows(columnar_path(history), HISTORY_COLUMNS))),
+        ):
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            rows = load()
+            elapsed = time.perf_counter() - t0
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"history load ({label}): {len(rows)} rows, {elapsed:.3f}s, peak {peak / 1e6:.1f} MB")
@@ -2,80 +2,569 @@
 
 from __future__ import annotations
 
+import argparse
+import importlib.util
 import json
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Callable, Iterable, Iterator, Literal
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from config import OUTPUT_DIR, SUPABASE_KEY, SUPABASE_URL
+from config import (
+    EXPORT_COLUMNAR,
+    EXPORT_PAGE_SIZE,
+    EXPORT_PAGINATION,
+    EXPORT_PLATFORM_COUNTS,
+    EXPORT_WATERMARK_LOOKBACK_HOURS,
+    EXPORT_WORKERS,
+    OUTPUT_DIR,
+    SCRAPER_DIR,
+    SUPABASE_KEY,
+    SUPABASE_URL,
+)
+from data.columnar import has_columnar_engine, write_columnar_snapshot
+from data.jsonrows import iter_json_rows, write_json_rows
+from data.platform_counts import (
+    PLATFORM_COUNTS_RPC,
+    aggregate_platform_counts,
+    platform_counts_path,
+)
 
+Pagination = Literal["keyset", "offset"]
 
-def _headers() -> dict:
+
+def _load_postgrest_paging():
+    """
+    offer-scraper/postgrest_paging.py — the keyset pager shared with the scraper. Loaded
+    by path on first keyset export, so importing this module (e.g. for
+    load_offer_metadata) does not need the scraper directory.
+    """
+    module = sys.modules.get("postgrest_paging")
+    if module is None:
+        spec = importlib.util.spec_from_file_location(
+            "postgrest_paging", SCRAPER_DIR / "postgrest_paging.py"
+        )
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["postgrest_paging"] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules["postgrest_paging"]
+            raise
+    return module
+
+
+EXPORT_TABLES = ("user_progress", "course_offer_history", "course_offer")
+# Primary keys (supabase/migrations); offset pages are ordered by them so ranges are stable
+TABLE_KEYS = {"user_progress": "id", "course_offer_history": "id", "course_offer": "nrc"}
+# Tables exported incrementally, by the timestamp their writers set on insert/update
+WATERMARK_COLUMNS = {"user_progress": "updated_at", "course_offer_history": "scraped_at"}
+WATERMARKS_FILE = "export_watermarks.json"
+
+_SESSION: requests.Session | None = None
+_SESSION_POOL = 0
+
+
+def _headers(key: str | None = None) -> dict:
+    key = key or SUPABASE_KEY
     return {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
+        "apikey": key,
+        "Authorization": f"Bearer {key}",
     }
 
 
-def fetch_table(table: str, select: str = "*") -> list[dict]:
-    if not SUPABASE_URL or not SUPABASE_KEY:
+def _session(pool_size: int = 1) -> requests.Session:
+    """
+    Keep-alive session shared by every request. Its connection pool grows to the
+    largest `pool_size` asked for (tables × page workers in export_all), so concurrent
+    requests never overflow it and have their connections discarded.
+    """
+    global _SESSION, _SESSION_POOL
+    if _SESSION is None:
+        _SESSION = requests.Session()
+    if pool_size > _SESSION_POOL:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        _SESSION.mount("http://", adapter)
+        _SESSION.mount("https://", adapter)
+        _SESSION_POOL = pool_size
+    return _SESSION
+
+
+def _endpoint(url: str | None, key: str | None) -> tuple[str, str]:
+    url, key = url or SUPABASE_URL, key or SUPABASE_KEY
+    if not url or not key:
         raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set")
-    rows: list[dict] = []
+    return url.rstrip("/"), key
+
+
+def _content_range_total(header: str | None) -> int | None:
+    """Total from a PostgREST Content-Range ("0-999/4213", "*/0"); None when not counted."""
+    match = re.search(r"/(\d+)$", header or "")
+    return int(match.group(1)) if match else None
+
+
+def _get_page(
+    session: requests.Session,
+    url: str,
+    key: str,
+    table: str,
+    params: dict | list[tuple[str, object]],
+    *,
+    count: bool = False,
+) -> requests.Response:
+    headers = _headers(key)
+    if count:
+        headers["Prefer"] = "count=exact"
+    resp = session.get(f"{url}/rest/v1/{table}", headers=headers, params=params, timeout=60)
+    resp.raise_for_status()
+    return resp
+
+
+def _page_params(
+    table: str,
+    select: str,
+    offset: int,
+    limit: int,
+    filters: list[tuple[str, str]] | None = None,
+) -> list[tuple[str, object]]:
+    params = [("select", select), ("offset", offset), ("limit", limit), *(filters or [])]
+    if table in TABLE_KEYS:
+        params.append(("order", f"{TABLE_KEYS[table]}.asc"))
+    return params
+
+
+def _offset_pages(
+    session: requests.Session,
+    url: str,
+    key: str,
+    table: str,
+    select: str,
+    page_size: int,
+    offset: int = 0,
+    filters: list[tuple[str, str]] | None = None,
+) -> Iterator[list[dict]]:
+    while True:
+        batch = _get_page(
+            session, url, key, table, _page_params(table, select, offset, page_size, filters)
+        ).json()
+        if not batch:
+            return
+        yield batch
+        if len(batch) < page_size:
+            return
+        offset += page_size
+
+
+def _windowed(fetch: Callable, items: Iterable, workers: int) -> Iterator:
+    """fetch(item) for every item, at most `workers` in flight, yielded in item order."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for item in items:
+            pending.append(pool.submit(fetch, item))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _counted_offset_pages(
+    session: requests.Session,
+    url: str,
+    key: str,
+    table: str,
+    select: str,
+    page_size: int,
+    workers: int,
+    filters: list[tuple[str, str]] | None = None,
+) -> Iterator[list[dict]]:
+    """
+    The first page asks for an exact count; the remaining page ranges are requested
+    `workers` at a time and yielded in offset order. Falls back to sequential paging
+    when the server does not report a total.
+    """
+    first = _get_page(
+        session, url, key, table, _page_params(table, select, 0, page_size, filters), count=True
+    )
+    rows: list[dict] = first.json()
+    if not rows:
+        return
+    yield rows
+    total = _content_range_total(first.headers.get("Content-Range"))
+    if total is None:
+        if len(rows) == page_size:
+            yield from _offset_pages(
+                session, url, key, table, select, page_size, len(rows), filters
+            )
+        return
+    # A server-side row cap (PostgREST db-max-rows) shortens pages below page_size
+    step = len(rows)
+
+    def fetch(offset: int) -> list[dict]:
+        return _get_page(
+            session, url, key, table, _page_params(table, select, offset, step, filters)
+        ).json()
+
+    yield from _windowed(fetch, range(step, total, step), workers)
+
+
+def iter_table_pages(
+    table: str,
+    select: str = "*",
+    *,
+    url: str | None = None,
+    key: str | None = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+    workers: int = 1,
+    pagination: Pagination | None = None,
+    filters: list[tuple[str, str]] | None = None,
+) -> Iterator[list[dict]]:
+    """
+    Pages of `table` in primary-key order, fetched lazily with at most `workers` pages
+    in flight. Keyset paging splits a uuid key space into `workers` ranges; offset
+    paging requests counted page ranges concurrently.
+    """
+    url, key = _endpoint(url, key)
+    if (pagination or EXPORT_PAGINATION) == "keyset" and table in TABLE_KEYS:
+        yield from _load_postgrest_paging().iter_keyset_pages(
+            url,
+            _headers(key),
+            table,
+            key=TABLE_KEYS[table],
+            select=select,
+            page_size=page_size,
+            filters=filters,
+            workers=workers,
+            session=_session(workers),
+        )
+    elif workers > 1:
+        yield from _counted_offset_pages(
+            _session(workers), url, key, table, select, page_size, workers, filters
+        )
+    else:
+        yield from _offset_pages(_session(), url, key, table, select, page_size, 0, filters)
+
+
+def _rows(pages: Iterable[list[dict]]) -> Iterator[dict]:
+    for page in pages:
+        yield from page
+
+
+def fetch_table(
+    table: str,
+    select: str = "*",
+    *,
+    url: str | None = None,
+    key: str | None = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+    pagination: Pagination | None = None,
+) -> list[dict]:
+    """All rows of `table` in primary-key order, one page after another."""
+    return list(
+        _rows(
+            iter_table_pages(
+                table, select, url=url, key=key, page_size=page_size, pagination=pagination
+            )
+        )
+    )
+
+
+def fetch_table_concurrent(
+    table: str,
+    select: str = "*",
+    *,
+    url: str | None = None,
+    key: str | None = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+    workers: int = EXPORT_WORKERS,
+    pagination: Pagination | None = None,
+) -> list[dict]:
+    """Same rows as fetch_table, with up to `workers` page requests in flight."""
+    return list(
+        _rows(
+            iter_table_pages(
+                table,
+                select,
+                url=url,
+                key=key,
+                page_size=page_size,
+                workers=workers,
+                pagination=pagination,
+            )
+        )
+    )
+
+
+def count_rows(table: str, *, url: str | None = None, key: str | None = None) -> int | None:
+    """Server-side row count of `table` (None when the server does not report one)."""
+    url, key = _endpoint(url, key)
+    select = TABLE_KEYS.get(table, "*")
+    resp = _get_page(
+        _session(), url, key, table, _page_params(table, select, 0, 1), count=True
+    )
+    return _content_range_total(resp.headers.get("Content-Range"))
+
+
+def fetch_table_since(
+    table: str,
+    column: str,
+    since: str,
+    select: str = "*",
+    *,
+    url: str | None = None,
+    key: str | None = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+    pagination: Pagination | None = None,
+) -> list[dict]:
+    """Rows whose `column` is at or after the ISO timestamp `since`."""
+    pages = iter_table_pages(
+        table,
+        select,
+        url=url,
+        key=key,
+        page_size=page_size,
+        pagination=pagination,
+        filters=[(column, f"gte.{since}")],
+    )
+    return list(_rows(pages))
+
+
+def _parse_timestamp(value: object) -> datetime | None:
+    try:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+class _Watermark:
+    """Latest `column` timestamp over the rows streamed through `observe`."""
+
+    def __init__(self, column: str | None) -> None:
+        self.column = column
+        self.latest: datetime | None = None
+
+    def observe(self, rows: Iterable[dict]) -> Iterator[dict]:
+        for row in rows:
+            ts = _parse_timestamp(row.get(self.column)) if row.get(self.column) else None
+            if ts and (self.latest is None or ts > self.latest):
+                self.latest = ts
+            yield row
+
+    @property
+    def value(self) -> str | None:
+        return self.latest.isoformat() if self.latest else None
+
+
+def merge_rows(existing: Iterable[dict], fresh: list[dict], key: str) -> Iterator[dict]:
+    """Upsert `fresh` into the `existing` stream by `key`; updated rows keep their position."""
+    pending = {row.get(key): row for row in fresh}
+    for row in existing:
+        yield pending.pop(row.get(key), row)
+    yield from pending.values()
+
+
+def _export_incremental(
+    table: str,
+    path: Path,
+    watermark: str,
+    mark: _Watermark,
+    *,
+    url: str | None,
+    key: str | None,
+) -> int | None:
+    """
+    Stream the snapshot at `path` with the rows written since `watermark` (minus the
+    lookback) upserted by primary key. Deletes are invisible to a watermark — the
+    scraper replaces a re-scraped history period — so when the merged count differs
+    from the server's the merge is discarded and None returned (fetch in full).
+    """
+    since = _parse_timestamp(watermark)
+    if since is None:
+        return None
+    since -= timedelta(hours=EXPORT_WATERMARK_LOOKBACK_HOURS)
+    fresh = fetch_table_since(
+        table, WATERMARK_COLUMNS[table], since.isoformat(), url=url, key=key
+    )
+    merged_path = path.with_name(path.name + ".merged")
+    n = write_json_rows(
+        merged_path, mark.observe(merge_rows(iter_json_rows(path), fresh, TABLE_KEYS[table]))
+    )
+    total = count_rows(table, url=url, key=key)
+    if total is not None and total != n:
+        merged_path.unlink()
+        return None
+    os.replace(merged_path, path)
+    return n
+
+
+def load_watermarks(directory: Path | None = None) -> dict:
+    p = (directory or OUTPUT_DIR) / WATERMARKS_FILE
+    if not p.exists():
+        return {}
+    with open(p, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_watermarks(watermarks: dict, directory: Path | None = None) -> Path:
+    dest = (directory or OUTPUT_DIR) / WATERMARKS_FILE
+    with open(dest, "w", encoding="utf-8") as f:
+        json.dump(watermarks, f, indent=2)
+    return dest
+
+
+def iter_platform_count_pages(
+    *,
+    url: str | None = None,
+    key: str | None = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> Iterator[list[dict]]:
+    """
+    get_predictor_platform_counts rows in pages. The result is one row per curriculum
+    course, so a few pages cover it; paging stops on an empty page (row-cap safe).
+    """
+    url, key = _endpoint(url, key)
+    session = _session()
     offset = 0
-    page_size = 1000
     while True:
-        resp = requests.get(
-            f"{SUPABASE_URL}/rest/v1/{table}",
-            headers=_headers(),
-            params={"select": select, "offset": offset, "limit": page_size},
+        params = [
+            ("order", "curriculum_id.asc,course_code.asc"),
+            ("offset", offset),
+            ("limit", page_size),
+        ]
+        resp = session.post(
+            f"{url}/rest/v1/rpc/{PLATFORM_COUNTS_RPC}",
+            headers=_headers(key),
+            params=params,
+            json={},
             timeout=60,
         )
         resp.raise_for_status()
         batch = resp.json()
         if not batch:
-            break
-        rows.extend(batch)
-        if len(batch) < page_size:
-            break
-        offset += page_size
-    return rows
+            return
+        yield batch
+        offset += len(batch)
 
 
-def fetch_offer_metadata() -> dict:
-    if not SUPABASE_URL or not SUPABASE_KEY:
+def fetch_offer_metadata(*, url: str | None = None, key: str | None = None) -> dict:
+    if not (url or SUPABASE_URL) or not (key or SUPABASE_KEY):
         return {}
-    resp = requests.get(
-        f"{SUPABASE_URL}/rest/v1/offer_metadata",
-        headers=_headers(),
-        params={"select": "*", "id": "eq.1"},
-        timeout=30,
-    )
-    resp.raise_for_status()
+    url, key = _endpoint(url, key)
+    resp = _get_page(_session(), url, key, "offer_metadata", {"select": "*", "id": "eq.1"})
     rows = resp.json()
     return rows[0] if rows else {}
 
 
-def export_all(out_dir: Path | None = None) -> dict[str, Path]:
+def export_all(
+    out_dir: Path | None = None,
+    *,
+    workers: int = EXPORT_WORKERS,
+    url: str | None = None,
+    key: str | None = None,
+    incremental: bool = False,
+    platform_counts: bool = EXPORT_PLATFORM_COUNTS,
+    columnar: bool = EXPORT_COLUMNAR,
+) -> dict[str, Path]:
+    """
+    Dump every training table to `out_dir`. Tables download in parallel, each with up to
+    `workers` concurrent page requests (`workers=1` pages every table sequentially), and
+    every page is streamed straight to disk, so memory stays at a few pages per table.
+    `incremental` merges rows newer than the stored watermarks into the existing
+    user_progress / course_offer_history snapshots instead of re-downloading them.
+    `platform_counts` fetches user_progress already aggregated per curriculum course;
+    otherwise (or when the RPC is missing or not executable with the key) the raw dump
+    is aggregated locally. Either way platform_counts.json is written for the predictor.
+    `columnar` adds a typed Parquet twin of each JSON snapshot when pyarrow is installed;
+    the JSON stays the source for incremental merges and for readers without pyarrow.
+    """
     dest = out_dir or OUTPUT_DIR
     dest.mkdir(exist_ok=True)
+    watermarks = load_watermarks(dest) if incremental else {}
+    # Every table may page concurrently with `workers` requests in flight
+    _session(max(workers, 1) * len(EXPORT_TABLES))
+
+    def export(table: str) -> tuple[int, bool, str | None]:
+        """Rows written, whether merged incrementally, and the table's new watermark."""
+        path = dest / f"{table}.json"
+        column = WATERMARK_COLUMNS.get(table)
+        previous = (watermarks.get(table) or {}).get("watermark")
+        if incremental and column and previous and path.exists():
+            mark = _Watermark(column)
+            n = _export_incremental(table, path, previous, mark, url=url, key=key)
+            if n is not None:
+                return n, True, mark.value
+        mark = _Watermark(column)
+        pages = iter_table_pages(table, url=url, key=key, workers=workers)
+        return write_json_rows(path, mark.observe(_rows(pages))), False, mark.value
+
+    # user_progress is only needed raw when its counts are not aggregated server-side
+    tables = [t for t in EXPORT_TABLES if not (platform_counts and t == "user_progress")]
+    with ThreadPoolExecutor(max_workers=len(tables) if workers > 1 else 1) as pool:
+        exported = dict(zip(tables, pool.map(export, tables)))
+
+    counts_path = platform_counts_path(dest)
+    source = "server-side aggregate"
+    if platform_counts:
+        try:
+            n_counts = write_json_rows(
+                counts_path, _rows(iter_platform_count_pages(url=url, key=key))
+            )
+        except requests.HTTPError as exc:
+            status = exc.response.status_code if exc.response is not None else None
+            if status not in (401, 403, 404):
+                raise
+            # 404: not deployed; 401/403: key without EXECUTE (e.g. the anon fallback)
+            reason = "is not deployed" if status == 404 else "is not callable with this key"
+            print(f"{PLATFORM_COUNTS_RPC} {reason}; exporting raw user_progress")
+            exported["user_progress"] = export("user_progress")
+            platform_counts = False
+    if not platform_counts:
+        progress_rows = iter_json_rows(dest / "user_progress.json")
+        n_counts = write_json_rows(counts_path, aggregate_platform_counts(progress_rows))
+        source = "aggregated from user_progress.json"
 
     paths = {}
-    for table in ("user_progress", "course_offer_history", "course_offer"):
-        data = fetch_table(table)
+    exported_at = datetime.now(timezone.utc).isoformat()
+    for table, (n_rows, merged, watermark) in exported.items():
         path = dest / f"{table}.json"
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, default=str)
         paths[table] = path
-        print(f"Exported {len(data)} rows → {path}")
-        if table == "user_progress" and len(data) == 0:
-            print(
-                "WARNING: user_progress is empty. "
-                "Set SUPABASE_SERVICE_KEY (service_role) in .env and ensure "
-                "GRANT SELECT ON user_progress TO service_role; "
-                "otherwise planned_count / in_progress_count will be 0."
-            )
+        mode = " (merged since watermark)" if merged else ""
+        print(f"Exported {n_rows} rows{mode} → {path}")
+        if table in WATERMARK_COLUMNS:
+            watermarks[table] = {
+                "column": WATERMARK_COLUMNS[table],
+                "watermark": watermark,
+                "rows": n_rows,
+                "exported_at": exported_at,
+            }
+    paths["platform_counts"] = counts_path
+    print(f"Exported {n_counts} platform count rows ({source}) → {counts_path}")
+    if n_counts == 0:
+        print(
+            "WARNING: user_progress counts are empty. "
+            "Set SUPABASE_SERVICE_KEY (service_role) in .env and ensure "
+            "GRANT SELECT ON user_progress TO service_role; "
+            "otherwise planned_count / in_progress_count will be 0."
+        )
+    paths["watermarks"] = save_watermarks(watermarks, dest)
 
-    meta = fetch_offer_metadata()
+    if columnar and not has_columnar_engine():
+        print("pyarrow is not installed; skipping Parquet snapshots (JSON only)")
+    elif columnar:
+        for table in list(exported) + ["platform_counts"]:
+            parquet = write_columnar_snapshot(paths[table], table)
+            if parquet is not None:
+                paths[f"{table}_columnar"] = parquet
+                print(f"Wrote columnar snapshot → {parquet}")
+
+    meta = fetch_offer_metadata(url=url, key=key)
     meta_path = dest / "offer_metadata.json"
     with open(meta_path, "w", encoding="utf-8") as f:
         json.dump(meta, f, indent=2, default=str)
@@ -94,4 +583,9 @@ def load_offer_metadata(path: Path | None = None) -> dict:
 
 
 if __name__ == "__main__":
-    export_all()
+    parser = argparse.ArgumentParser(description="Export Supabase tables for training")
+    parser.add_argument(
+        "--incremental", action="store_true", help="Merge rows newer than stored watermarks"
+    )
+    args = parser.parse_args()
+    export_all(incremental=args.incremental)
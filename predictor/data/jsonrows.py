@@ -0,0 +1,75 @@
+"""Table snapshots written page by page and read back one row at a time."""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+
+def write_json_rows(path: Path, rows: Iterable[dict]) -> int:
+    """
+    Write `rows` as a compact JSON array with one row per line — still plain JSON for
+    json.load, and streamable by iter_json_rows. Rows are consumed lazily, so memory
+    stays at one row; the file is renamed into place only once complete.
+    """
+    tmp = path.with_name(path.name + ".partial")
+    n = 0
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("[")
+            for row in rows:
+                f.write(",\n" if n else "\n")
+                f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":"), default=str))
+                n += 1
+            f.write("\n]\n")
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return n
+
+
+def _project(rows: Iterator[dict], columns: Sequence[str] | None) -> Iterator[dict]:
+    if columns is None:
+        yield from rows
+        return
+    for row in rows:
+        yield {c: row[c] for c in columns if c in row}
+
+
+def _line_rows(first: dict, lines: Iterable[str]) -> Iterator[dict]:
+    yield first
+    for line in lines:
+        text = line.strip().rstrip(",")
+        if text and text != "]":
+            yield json.loads(text)
+
+
+def iter_json_rows(path: Path, columns: Sequence[str] | None = None) -> Iterator[dict]:
+    """
+    Rows of a JSON array or NDJSON file, keeping only `columns` when given. Files with
+    one row per line (write_json_rows, NDJSON) are parsed line by line; any other JSON
+    array (e.g. indented) is loaded whole.
+    """
+    with open(path, encoding="utf-8") as f:
+        head = f.readline().strip()
+        if head.startswith("{"):
+            yield from _project(_line_rows(json.loads(head), f), columns)
+            return
+        if head == "[":
+            first = f.readline().strip().rstrip(",")
+            if first in ("]", ""):
+                return
+            try:
+                row = json.loads(first)
+            except json.JSONDecodeError:
+                row = None
+            if isinstance(row, dict):
+                yield from _project(_line_rows(row, f), columns)
+                return
+        if not head:
+            return
+        f.seek(0)
+        yield from _project(iter(json.load(f) or []), columns)
@@ -0,0 +1,51 @@
+"""
+user_progress counts per (curriculum, course), the only user_progress data the predictor
+reads. Exported from get_predictor_platform_counts (supabase/migrations) or aggregated
+locally from a raw user_progress dump; both give the same rows.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from config import OUTPUT_DIR
+from data.columnar import iter_table_rows
+
+PLATFORM_COUNTS_RPC = "get_predictor_platform_counts"
+PLATFORM_COUNTS_FILE = "platform_counts.json"
+
+
+def aggregate_platform_counts(progress_rows: Iterable[dict]) -> list[dict]:
+    """
+    Local equivalent of get_predictor_platform_counts: raw course codes counted per
+    curriculum, one entry per listed course (duplicates included), ordered like the RPC.
+    """
+    counts: dict[tuple[str, str], list[int]] = {}
+    for row in progress_rows:
+        curriculum_id = row.get("curriculum_id")
+        for slot, column in ((0, "in_progress_courses"), (1, "planned_courses")):
+            courses = row.get(column)
+            if not isinstance(courses, list):
+                continue
+            for cid in courses:
+                counts.setdefault((curriculum_id, str(cid)), [0, 0])[slot] += 1
+    return [
+        {
+            "curriculum_id": curriculum_id,
+            "course_code": course_code,
+            "in_progress": in_progress,
+            "planned": planned,
+        }
+        for (curriculum_id, course_code), (in_progress, planned) in sorted(
+            counts.items(), key=lambda item: (item[0][0] or "", item[0][1])
+        )
+    ]
+
+
+def platform_counts_path(directory: Path | None = None) -> Path:
+    return (directory or OUTPUT_DIR) / PLATFORM_COUNTS_FILE
+
+
+def iter_platform_counts(path: Path | None = None) -> Iterator[dict]:
+    yield from iter_table_rows(path or platform_counts_path())
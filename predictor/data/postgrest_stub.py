@@ -0,0 +1,310 @@
+"""
+Local PostgREST stand-in for exercising data/export.py without Supabase.
+
+Serves in-memory tables at /rest/v1/<table> with the subset of PostgREST the exporter
+uses: select, order, offset/limit, column filters (eq/gt/gte/lt/lte) and
+`Prefer: count=exact` → Content-Range. `latency` sleeps per request and `offset_cost`
+per skipped row, to mimic a remote database scanning past OFFSET; `max_rows` caps every
+response like PostgREST's db-max-rows. POST /rest/v1/rpc/<name> calls `functions[name]`
+with the served tables, its rows paged like a table. Ascending single-column orders are served from a
+sorted index (a primary-key btree stand-in), so range filters on that column are
+bisected instead of scanned; call `invalidate()` after mutating a served table.
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable
+from urllib.parse import parse_qsl, urlsplit
+
+_OPS = {
+    "eq": lambda a, b: a == b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+_RESERVED = {"select", "order", "offset", "limit", "on_conflict"}
+
+
+def _coerce(raw: str, like: object) -> object:
+    """Filter value typed like the column value it is compared with."""
+    if isinstance(like, bool):
+        return raw.lower() == "true"
+    if isinstance(like, (int, float)):
+        return float(raw)
+    return raw
+
+
+def _matches(row: dict, column: str, expr: str) -> bool:
+    op, _, raw = expr.partition(".")
+    value = row.get(column)
+    if op not in _OPS or value is None:
+        return False
+    return _OPS[op](value, _coerce(raw, value))
+
+
+def _sort_key(value: object) -> tuple:
+    # NULLS LAST, like Postgres ascending order
+    return (value is None, value if value is not None else "")
+
+
+@dataclass
+class PostgrestStub:
+    tables: dict[str, list[dict]]
+    latency: float = 0.0
+    offset_cost: float = 0.0
+    max_rows: int | None = None
+    functions: dict[str, Callable[[dict], list[dict]]] = field(default_factory=dict)
+    requests_served: int = 0
+    _server: ThreadingHTTPServer | None = field(default=None, repr=False)
+    _indexes: dict = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None, "stub not started"
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    def _index(self, table: str, column: str) -> tuple[list, list[dict]] | None:
+        """(sorted keys, rows in key order), or None when the column has nulls."""
+        with self._lock:
+            if (table, column) not in self._indexes:
+                rows = self.tables.get(table, [])
+                if any(r.get(column) is None for r in rows):
+                    self._indexes[(table, column)] = None
+                else:
+                    ordered = sorted(rows, key=lambda r: r[column])
+                    self._indexes[(table, column)] = ([r[column] for r in ordered], ordered)
+            return self._indexes[(table, column)]
+
+    def _filter(
+        self, table: str, filters: list[tuple[str, str]], order: list[str]
+    ) -> list[dict]:
+        column, _, direction = order[0].partition(".") if len(order) == 1 else ("", "", "")
+        indexed = column and direction != "desc" and table in self.tables
+        index = self._index(table, column) if indexed else None
+        if index is None:
+            rows = self.tables.get(table, [])
+            if table.startswith("rpc/"):
+                rows = self.functions[table[len("rpc/"):]](self.tables)
+            for col, expr in filters:
+                rows = [r for r in rows if _matches(r, col, expr)]
+            for term in reversed(order):
+                col, _, direction = term.partition(".")
+                rows = sorted(
+                    rows, key=lambda r: _sort_key(r.get(col)), reverse=direction == "desc"
+                )
+            return rows
+
+        keys, ordered = index
+        lo, hi, rest = 0, len(keys), []
+        for col, expr in filters:
+            op, _, raw = expr.partition(".")
+            if col != column or op not in _OPS or op == "eq" or not keys:
+                rest.append((col, expr))
+                continue
+            value = _coerce(raw, keys[0])
+            if op in ("gt", "gte"):
+                find = bisect.bisect_right if op == "gt" else bisect.bisect_left
+                lo = max(lo, find(keys, value))
+            else:
+                find = bisect.bisect_left if op == "lt" else bisect.bisect_right
+                hi = min(hi, find(keys, value))
+        rows = ordered[lo:hi]
+        for col, expr in rest:
+            rows = [r for r in rows if _matches(r, col, expr)]
+        return rows
+
+    def query(self, table: str, params: list[tuple[str, str]]) -> tuple[list[dict], int]:
+        """Rows for one GET and the total matching rows before offset/limit."""
+        opts = {k: v for k, v in params if k in _RESERVED}
+        filters = [(k, v) for k, v in params if k not in _RESERVED]
+        order = [t for t in opts.get("order", "").split(",") if t]
+        rows = self._filter(table, filters, order)
+        total = len(rows)
+        offset = int(opts.get("offset", 0))
+        limit = int(opts["limit"]) if "limit" in opts else total
+        if self.max_rows is not None:
+            limit = min(limit, self.max_rows)
+        page = rows[offset : offset + limit]
+        select = opts.get("select", "*")
+        if select != "*":
+            columns = [c.strip() for c in select.split(",")]
+            page = [{c: r.get(c) for c in columns} for r in page]
+        return page, total
+
+    def start(self) -> PostgrestStub:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _target(self) -> tuple[str, list[tuple[str, str]]] | None:
+                parts = urlsplit(self.path)
+                prefix = "/rest/v1/"
+                if not parts.path.startswith(prefix):
+                    self.send_error(404)
+                    return None
+                return parts.path[len(prefix):], parse_qsl(parts.query, keep_blank_values=True)
+
+            def do_GET(self) -> None:  # noqa: N802
+                target = self._target()
+                if target is not None:
+                    self._respond(*target)
+
+            def do_POST(self) -> None:  # noqa: N802
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                target = self._target()
+                if target is None:
+                    return
+                name = target[0][len("rpc/"):]
+                if not target[0].startswith("rpc/") or name not in stub.functions:
+                    self.send_error(404)
+                    return
+                self._respond(*target)
+
+            def _respond(self, table: str, params: list[tuple[str, str]]) -> None:
+                page, total = stub.query(table, params)
+                offset = int(dict(params).get("offset", 0))
+                with stub._lock:
+                    stub.requests_served += 1
+                time.sleep(stub.latency + stub.offset_cost * offset)
+
+                body = json.dumps(page, default=str).encode("utf-8")
+                counted = "count=exact" in (self.headers.get("Prefer") or "")
+                span = f"{offset}-{offset + len(page) - 1}" if page else "*"
+                self.send_response(206 if counted and len(page) < total else 200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Content-Range", f"{span}/{total if counted else '*'}")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> PostgrestStub:
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def load_stub_tables(directory: Path) -> dict[str, list[dict]]:
+    """Tables from an export directory (output/<table>.json)."""
+    from data.export import EXPORT_TABLES
+
+    tables: dict[str, list[dict]] = {}
+    for table in EXPORT_TABLES:
+        path = directory / f"{table}.json"
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                tables[table] = json.load(f)
+    return tables
+
+
+def synthetic_history(n_rows: int) -> list[dict]:
+    """course_offer_history-shaped rows with random uuid ids (unordered, like the table)."""
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "nrc": str(1000 + i % 3000),
+            "course_code": f"MAT{100 + i % 400}",
+            "period_code": f"20{20 + i % 6}10",
+            "type": "Teoría",
+            "total": i % 40,
+            "scraped_at": f"2026-01-{1 + i % 28:02d}T00:00:00+00:00",
+        }
+        for i in range(n_rows)
+    ]
+
+
+def benchmark_export(
+    tables: dict[str, list[dict]],
+    *,
+    latency: float,
+    offset_cost: float = 0.0,
+    page_size: int = 1000,
+    workers: int = 4,
+) -> dict:
+    """Offset vs keyset paging, sequential and concurrent, for every table on the stub."""
+    from data.export import fetch_table, fetch_table_concurrent
+
+    def runs(url: str) -> dict:
+        opts = {"url": url, "key": "stub", "page_size": page_size}
+        return {
+            f"{pagination}_{mode}": (
+                lambda t, p=pagination, c=concurrent: fetch_table_concurrent(
+                    t, pagination=p, workers=workers, **opts
+                )
+                if c
+                else fetch_table(t, pagination=p, **opts)
+            )
+            for pagination in ("offset", "keyset")
+            for mode, concurrent in (("sequential", False), ("concurrent", True))
+        }
+
+    report: dict = {}
+    with PostgrestStub(tables, latency=latency, offset_cost=offset_cost) as stub:
+        for table, rows in tables.items():
+            entry: dict = {"rows": len(rows)}
+            fetched = []
+            for name, run in runs(stub.url).items():
+                served = stub.requests_served
+                t0 = time.perf_counter()
+                fetched.append(run(table))
+                entry[f"{name}_s"] = round(time.perf_counter() - t0, 3)
+                entry[f"{name}_requests"] = stub.requests_served - served
+            entry["identical"] = all(f == fetched[0] for f in fetched) and len(
+                fetched[0]
+            ) == len(rows)
+            report[table] = entry
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the exporter against a local stub")
+    parser.add_argument("--from-dir", type=Path, help="Serve an export directory's tables")
+    parser.add_argument("--rows", type=int, default=20000, help="Synthetic history rows")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per request")
+    parser.add_argument("--offset-cost", type=float, default=0.0, help="Seconds per skipped row")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    tables = (
+        load_stub_tables(args.from_dir)
+        if args.from_dir
+        else {"course_offer_history": synthetic_history(args.rows)}
+    )
+    report = benchmark_export(
+        tables,
+        latency=args.latency,
+        offset_cost=args.offset_cost,
+        page_size=args.page_size,
+        workers=args.workers,
+    )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,103 @@
+"""Shrinkage-alpha sweep: backtest MAE per alpha from one set of calibration sums."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Sequence
+
+from config import OUTPUT_DIR, TRANSITION_ALPHA_GRID, TRANSITION_SHRINKAGE_ALPHA
+from eval.backtest import actuals_at, actuals_table, error_metrics, predicted_students
+from features.build import ProgressIndex, build_feature_frames, load_progress_index
+from features.calibration_matrix import build_calibration_prefix
+from features.history_stats import HistoryStore, build_history_store, load_history_rows
+from features.period_calendar import build_calendar
+from features.transition_calibration import build_rate_tables
+
+
+def run_alpha_sweep(
+    alphas: Sequence[float] = TRANSITION_ALPHA_GRID,
+    holdout_periods: list[str] | None = None,
+    history_path: Path | None = None,
+    *,
+    history_store: HistoryStore | None = None,
+    progress_index: ProgressIndex | None = None,
+) -> dict:
+    """
+    Backtest the calibrated predictor for every alpha in the grid. Pair sums are
+    accumulated once (prefix per holdout cutoff) and shrinkage is applied to the whole
+    grid at once; feature frames share everything but propagation, so each extra alpha
+    only costs one propagation pass per curriculum.
+    """
+    cal = build_calendar()
+    store = history_store if history_store is not None else build_history_store(
+        load_history_rows(history_path)
+    )
+    if not len(store):
+        return {"error": "no history", "alphas": list(alphas)}
+    progress = progress_index if progress_index is not None else load_progress_index()
+
+    if holdout_periods is None:
+        holdout_periods = [c for c in cal.regular_codes() if c >= "202510"]
+
+    calibration = build_calibration_prefix(store.index().aggregate(calendar=cal), cal)
+    actuals = actuals_table(store.rows)
+    per_alpha: list[list[dict]] = [[] for _ in alphas]
+
+    for target in holdout_periods:
+        at_target = actuals_at(actuals, target)
+        if at_target.empty:
+            continue
+
+        tables = build_rate_tables(calibration.accumulators(target), alphas)
+        frames = build_feature_frames(
+            tables,
+            target_period_code=target,
+            history_store=store,
+            progress_index=progress,
+        )
+
+        actual = at_target[at_target["actual"] > 0].reset_index(drop=True)
+        y_true = actual["actual"].to_numpy()
+        for results, df in zip(per_alpha, frames):
+            results.append(
+                {
+                    "target_period": target,
+                    "n_courses": len(actual),
+                    **error_metrics(y_true, predicted_students(df, actual)),
+                }
+            )
+
+    sweep = [
+        {
+            "alpha": alpha,
+            "avg_mae": round(sum(r["mae"] for r in results) / len(results), 2) if results else None,
+            "periods": results,
+        }
+        for alpha, results in zip(alphas, per_alpha)
+    ]
+    scored = [s for s in sweep if s["avg_mae"] is not None]
+    best = min(scored, key=lambda s: s["avg_mae"])["alpha"] if scored else None
+    return {
+        "holdout_periods": holdout_periods,
+        "current_alpha": TRANSITION_SHRINKAGE_ALPHA,
+        "best_alpha": best,
+        "sweep": sweep,
+    }
+
+
+def save_alpha_sweep_report(report: dict, path: Path | None = None) -> Path:
+    dest = path or OUTPUT_DIR / "alpha_sweep_report.json"
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with open(dest, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return dest
+
+
+if __name__ == "__main__":
+    report = run_alpha_sweep()
+    out = save_alpha_sweep_report(report)
+    for row in report.get("sweep", []):
+        marker = " *" if row["alpha"] == report.get("best_alpha") else ""
+        print(f"alpha={row['alpha']:>6}: avg MAE {row['avg_mae']}{marker}")
+    print(f"Report → {out}")
@@ -2,17 +2,22 @@
 
 from __future__ import annotations
 
+import argparse
 import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
 from config import OUTPUT_DIR
-from features.build import build_feature_frame
-from features.history_stats import load_history_rows
+from features.build import ProgressIndex, build_feature_frames, load_progress_index
+from features.calibration_matrix import CalibrationPrefix, build_calibration_prefix
+from features.codes import normalize_course_code
+from features.history_stats import HistoryStore, build_history_store, load_history_rows
 from features.period_calendar import build_calendar
-from features.transition_calibration import calibrate_transitions, save_transition_rates
+from features.transition_calibration import save_transition_rates
 
 
 def _mae(y_true: np.ndarray, y_pred: np.ndarray) -> float:
@@ -36,101 +41,164 @@ def _section_error(y_true: np.ndarray, y_pred: np.ndarray) -> float:
     return float(np.mean(np.abs(true_sec - pred_sec)))
 
 
+def error_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> dict:
+    """MAE, MAPE and section MAE of predicted vs actual students."""
+    return {
+        "mae": round(_mae(y_true, y_pred), 2),
+        "mape": round(_mape(y_true, y_pred), 2),
+        "section_mae": round(_section_error(y_true, y_pred), 2),
+    }
+
+
+def actuals_table(rows: list[dict]) -> pd.DataFrame:
+    """
+    Teoría students per (period_code, offer_code) over the full history, built once and
+    sliced per holdout. Codes keep first-appearance order within each period.
+    """
+    teoria = [r for r in rows if r.get("type") == "Teoría"]
+    raw_codes = [str(r.get("course_code", "")) for r in teoria]
+    normalized = {c: normalize_course_code(c) for c in set(raw_codes)}
+    frame = pd.DataFrame(
+        {
+            "period_code": [r.get("period_code") or r.get("period") or "" for r in teoria],
+            "offer_code": [normalized[c] for c in raw_codes],
+            "actual": np.array([int(float(r.get("total") or 0)) for r in teoria], dtype=np.int64),
+        }
+    )
+    return (
+        frame.groupby(["period_code", "offer_code"], sort=False)["actual"].sum().reset_index()
+    )
+
+
+def actuals_at(actuals: pd.DataFrame, target: str) -> pd.DataFrame:
+    """offer_code / actual rows at `target` (empty when the period has no Teoría rows)."""
+    return actuals.loc[actuals["period_code"] == target, ["offer_code", "actual"]].reset_index(
+        drop=True
+    )
+
+
+def predicted_students(df: pd.DataFrame, actual: pd.DataFrame) -> np.ndarray:
+    """estimated_students aligned to `actual` (first row per code), 0 when not predicted."""
+    if df.empty:
+        return np.zeros(len(actual), dtype=np.int64)
+    preds = df.drop_duplicates("offer_code")[["offer_code", "estimated_students"]]
+    merged = actual[["offer_code"]].merge(preds, on="offer_code", how="left")
+    return merged["estimated_students"].fillna(0).to_numpy(dtype=np.int64)
+
+
+@dataclass
+class _BacktestContext:
+    """Inputs shared by every holdout period (shipped once per worker)."""
+
+    store: HistoryStore
+    actuals: pd.DataFrame
+    calibration: CalibrationPrefix
+    progress: ProgressIndex
+
+
+def _evaluate_target(ctx: _BacktestContext, target: str) -> dict | None:
+    at_target = actuals_at(ctx.actuals, target)
+    if at_target.empty:
+        return None
+
+    rates = ctx.calibration.rate_table(target)
+
+    # Trains on the store's rows before target; rate-independent features are built
+    # once and only propagation runs per rate set
+    fixed_df, cal_df = build_feature_frames(
+        [None, rates],
+        target_period_code=target,
+        history_store=ctx.store,
+        progress_index=ctx.progress,
+    )
+
+    actual = at_target[at_target["actual"] > 0].reset_index(drop=True)
+    y_true = actual["actual"].to_numpy()
+    y_fixed = predicted_students(fixed_df, actual)
+    y_cal = predicted_students(cal_df, actual)
+
+    mac_mask = actual["offer_code"].str.startswith("MAC").to_numpy(dtype=bool)
+    result = {
+        "target_period": target,
+        "n_courses": len(actual),
+        "fixed": error_metrics(y_true, y_fixed),
+        "calibrated": error_metrics(y_true, y_cal),
+    }
+    if mac_mask.any():
+        result["mac_subset"] = {
+            "n": int(mac_mask.sum()),
+            "fixed_mae": round(_mae(y_true[mac_mask], y_fixed[mac_mask]), 2),
+            "calibrated_mae": round(_mae(y_true[mac_mask], y_cal[mac_mask]), 2),
+        }
+    return result
+
+
+_WORKER_CONTEXT: _BacktestContext | None = None
+
+
+def _init_backtest_worker(ctx: _BacktestContext) -> None:
+    global _WORKER_CONTEXT
+    _WORKER_CONTEXT = ctx
+
+
+def _worker_evaluate_target(target: str) -> dict | None:
+    assert _WORKER_CONTEXT is not None
+    return _evaluate_target(_WORKER_CONTEXT, target)
+
+
 def run_backtest(
     holdout_periods: list[str] | None = None,
     history_path: Path | None = None,
+    *,
+    history_store: HistoryStore | None = None,
+    progress_index: ProgressIndex | None = None,
+    workers: int = 1,
 ) -> dict:
+    """
+    Fixed vs calibrated rates on each holdout period, each trained on the history rows
+    before it. `workers > 1` evaluates holdouts in a process pool; results are merged in
+    period order, identical to the serial path.
+    """
     cal = build_calendar()
-    rows = load_history_rows(history_path)
-    if not rows:
+    store = history_store if history_store is not None else build_history_store(
+        load_history_rows(history_path)
+    )
+    if not len(store):
         return {"error": "no history", "periods": []}
+    progress = progress_index if progress_index is not None else load_progress_index()
 
     if holdout_periods is None:
         holdout_periods = [c for c in cal.regular_codes() if c >= "202510"]
 
-    results: list[dict] = []
-
-    for target in holdout_periods:
-        train_rows = [
-            r for r in rows
-            if (r.get("period_code") or r.get("period") or "") < target
-        ]
-
-        rates = calibrate_transitions(train_rows, cal, max_period=target)
-
-        fixed_df = build_feature_frame(
-            use_calibrated_rates=False,
-            target_period_code=target,
-            history_rows=train_rows,
-        )
-        cal_df = build_feature_frame(
-            rates=rates,
-            target_period_code=target,
-            history_rows=train_rows,
-        )
-
-        # Actuals at target from full history
-        actual_map: dict[str, int] = {}
-        for r in rows:
-            if r.get("type") != "Teoría":
-                continue
-            pc = r.get("period_code") or r.get("period") or ""
-            if pc != target:
-                continue
-            from features.codes import normalize_course_code
-
-            code = normalize_course_code(str(r.get("course_code", "")))
-            actual_map[code] = actual_map.get(code, 0) + int(float(r.get("total") or 0))
-
-        if not actual_map:
-            continue
-
-        eval_codes = [c for c in actual_map if actual_map[c] > 0]
-        y_true = np.array([actual_map[c] for c in eval_codes])
-
-        fixed_preds = []
-        cal_preds = []
-        for code in eval_codes:
-            fr = fixed_df[fixed_df["offer_code"] == code]
-            cr = cal_df[cal_df["offer_code"] == code]
-            fixed_preds.append(int(fr["estimated_students"].iloc[0]) if len(fr) else 0)
-            cal_preds.append(int(cr["estimated_students"].iloc[0]) if len(cr) else 0)
-
-        y_fixed = np.array(fixed_preds)
-        y_cal = np.array(cal_preds)
-
-        mac_mask = np.array([c.startswith("MAC") for c in eval_codes])
-        result = {
-            "target_period": target,
-            "n_courses": len(eval_codes),
-            "fixed": {
-                "mae": round(_mae(y_true, y_fixed), 2),
-                "mape": round(_mape(y_true, y_fixed), 2),
-                "section_mae": round(_section_error(y_true, y_fixed), 2),
-            },
-            "calibrated": {
-                "mae": round(_mae(y_true, y_cal), 2),
-                "mape": round(_mape(y_true, y_cal), 2),
-                "section_mae": round(_section_error(y_true, y_cal), 2),
-            },
-        }
-        if mac_mask.any():
-            result["mac_subset"] = {
-                "n": int(mac_mask.sum()),
-                "fixed_mae": round(_mae(y_true[mac_mask], y_fixed[mac_mask]), 2),
-                "calibrated_mae": round(_mae(y_true[mac_mask], y_cal[mac_mask]), 2),
-            }
-        results.append(result)
+    # Pair sums per edge for every cutoff at once; each holdout slices its prefix
+    ctx = _BacktestContext(
+        store=store,
+        actuals=actuals_table(store.rows),
+        calibration=build_calibration_prefix(store.index().aggregate(calendar=cal), cal),
+        progress=progress,
+    )
+
+    if workers > 1 and len(holdout_periods) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(holdout_periods)),
+            initializer=_init_backtest_worker,
+            initargs=(ctx,),
+        ) as pool:
+            evaluated = list(pool.map(_worker_evaluate_target, holdout_periods))
+    else:
+        evaluated = [_evaluate_target(ctx, target) for target in holdout_periods]
+    results = [r for r in evaluated if r is not None]
 
     report = {
         "holdout_periods": holdout_periods,
         "results": results,
-        "summary": _summarize(results),
+        "summary": summarize_errors(results),
     }
     return report
 
 
-def _summarize(results: list[dict]) -> dict:
+def summarize_errors(results: list[dict]) -> dict:
+    """Average fixed vs calibrated MAE over per-period results."""
     if not results:
         return {}
     fixed_maes = [r["fixed"]["mae"] for r in results]
@@ -154,7 +222,12 @@ def save_backtest_report(report: dict, path: Path | None = None) -> Path:
 
 
 if __name__ == "__main__":
-    report = run_backtest()
+    parser = argparse.ArgumentParser(description="Backtest fixed vs calibrated transition rates")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Processes evaluating holdout periods"
+    )
+    args = parser.parse_args()
+    report = run_backtest(workers=args.workers)
     out = save_backtest_report(report)
     print(json.dumps(report.get("summary", {}), indent=2))
     print(f"Report → {out}")
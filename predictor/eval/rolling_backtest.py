@@ -0,0 +1,138 @@
+"""Rolling-origin backtest: every regular period in the catalog, trained on its prefix."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from config import OUTPUT_DIR
+from eval.backtest import (
+    actuals_at,
+    actuals_table,
+    error_metrics,
+    predicted_students,
+    summarize_errors,
+)
+from features.build import ProgressIndex, build_feature_frames, load_progress_index
+from features.calibration_matrix import build_calibration_prefix
+from features.history_stats import (
+    HistoryStore,
+    PrefixHistoryStats,
+    build_history_store,
+    load_history_rows,
+)
+from features.period_calendar import build_calendar
+
+
+def _faculty_errors(
+    actual: pd.DataFrame,
+    fixed_df: pd.DataFrame,
+    cal_df: pd.DataFrame,
+) -> dict[str, dict]:
+    """
+    Errors per curriculum faculty. A course shared by several faculties counts for each,
+    scored with that faculty's own first prediction row.
+    """
+    columns = ["faculty", "offer_code", "estimated_students"]
+    fixed = fixed_df.drop_duplicates(["faculty", "offer_code"])[columns]
+    calibrated = cal_df.drop_duplicates(["faculty", "offer_code"])[columns]
+    merged = fixed.merge(
+        calibrated, on=["faculty", "offer_code"], suffixes=("_fixed", "_cal")
+    ).merge(actual, on="offer_code")
+
+    errors: dict[str, dict] = {}
+    for faculty, group in merged.groupby("faculty", sort=True):
+        y_true = group["actual"].to_numpy()
+        errors[faculty] = {
+            "n_courses": len(group),
+            "fixed": error_metrics(y_true, group["estimated_students_fixed"].to_numpy()),
+            "calibrated": error_metrics(y_true, group["estimated_students_cal"].to_numpy()),
+        }
+    return errors
+
+
+def run_rolling_backtest(
+    history_path: Path | None = None,
+    *,
+    history_store: HistoryStore | None = None,
+    progress_index: ProgressIndex | None = None,
+) -> dict:
+    """
+    Evaluate fixed vs calibrated rates on every regular period with earlier history,
+    oldest first. Course stats and per-course rows grow with the prefix
+    (PrefixHistoryStats) and calibration slices the per-edge prefix sums, so each extra
+    period costs one feature build.
+    Returns per-period and per-faculty error series.
+    """
+    cal = build_calendar()
+    store = history_store if history_store is not None else build_history_store(
+        load_history_rows(history_path)
+    )
+    if not len(store):
+        return {"error": "no history", "periods": []}
+    progress = progress_index if progress_index is not None else load_progress_index()
+
+    actuals = actuals_table(store.rows)
+    calibration = build_calibration_prefix(store.index().aggregate(calendar=cal), cal)
+    prefix_stats = PrefixHistoryStats(store, cal)
+
+    by_period: list[dict] = []
+    by_faculty: dict[str, list[dict]] = {}
+    for target in cal.regular_codes():
+        at_target = actuals_at(actuals, target)
+        if at_target.empty or store.cut(target) == 0:
+            continue
+        prefix_stats.advance_to(target)
+
+        fixed_df, cal_df = build_feature_frames(
+            [None, calibration.rate_table(target)],
+            target_period_code=target,
+            history_index=prefix_stats.index,
+            history_stats=prefix_stats.stats(target),
+            progress_index=progress,
+        )
+
+        actual = at_target[at_target["actual"] > 0].reset_index(drop=True)
+        y_true = actual["actual"].to_numpy()
+        y_fixed = predicted_students(fixed_df, actual)
+        y_cal = predicted_students(cal_df, actual)
+        by_period.append(
+            {
+                "target_period": target,
+                "n_train_rows": store.cut(target),
+                "n_courses": len(actual),
+                "fixed": error_metrics(y_true, y_fixed),
+                "calibrated": error_metrics(y_true, y_cal),
+            }
+        )
+        for faculty, errors in _faculty_errors(actual, fixed_df, cal_df).items():
+            by_faculty.setdefault(faculty, []).append({"target_period": target, **errors})
+
+    return {
+        "target_periods": [r["target_period"] for r in by_period],
+        "by_period": by_period,
+        "by_faculty": dict(sorted(by_faculty.items())),
+        "summary": summarize_errors(by_period),
+    }
+
+
+def save_rolling_backtest_report(report: dict, path: Path | None = None) -> Path:
+    dest = path or OUTPUT_DIR / "rolling_backtest_report.json"
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with open(dest, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return dest
+
+
+if __name__ == "__main__":
+    report = run_rolling_backtest()
+    out = save_rolling_backtest_report(report)
+    for row in report.get("by_period", []):
+        print(
+            f"{row['target_period']}: MAE fixed {row['fixed']['mae']} "
+            f"calibrated {row['calibrated']['mae']} (n={row['n_courses']})"
+        )
+    print(json.dumps(report.get("summary", {}), indent=2))
+    print(f"Report → {out}")
@@ -3,20 +3,31 @@
 from __future__ import annotations
 
 import json
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Iterable, Sequence
 
 import pandas as pd
 
 from config import CURRICULA_DIR, OUTPUT_DIR
+from data.columnar import iter_table_rows
 from data.export import load_offer_metadata
+from data.platform_counts import iter_platform_counts, platform_counts_path
 from features.codes import normalize_course_code
 from features.demand_formula import compute_demand_prediction
-from features.history_stats import aggregate_history_rows, load_history_rows
-from features.period_calendar import build_calendar
+from features.history_stats import (
+    CourseHistoryStats,
+    HistoryIndex,
+    HistoryStore,
+    aggregate_history_rows,
+    build_history_index,
+)
+from features.period_calendar import AcademicCalendar, build_calendar
 from features.transition_calibration import TransitionRateTable, load_transition_rates
 from graph.curriculum import build_graph, faculty_from_curriculum_id, graph_features, iter_curricula
 from graph.propagation import (
+    CurriculumGraph,
     build_curriculum_graph,
     build_historical_seeds,
     propagate_demand_from_sources,
@@ -36,29 +47,91 @@ def _is_verano_block(block: str | None) -> bool:
     return "verano" in (block or "").lower()
 
 
+@dataclass
+class ProgressIndex:
+    """user_progress counts by curriculum_id and normalized offer code, built in one pass."""
+
+    cursando: dict[str, dict[str, int]] = field(default_factory=dict)
+    planned: dict[str, dict[str, int]] = field(default_factory=dict)
+    total_cursando: dict[str, int] = field(default_factory=dict)
+    total_planned: dict[str, int] = field(default_factory=dict)
+
+    def counts_for(self, curriculum_id: str | None = None) -> tuple[dict[str, int], dict[str, int]]:
+        """Returns (cursando, planned_next); all curricula when curriculum_id is empty."""
+        if not curriculum_id:
+            return dict(self.total_cursando), dict(self.total_planned)
+        return (
+            dict(self.cursando.get(curriculum_id, {})),
+            dict(self.planned.get(curriculum_id, {})),
+        )
+
+
+def build_progress_index(rows: Iterable[dict]) -> ProgressIndex:
+    index = ProgressIndex()
+    normalized: dict[str, str] = {}
+
+    def _count(by_curriculum: dict, totals: dict, curriculum_id, course_ids) -> None:
+        bucket = by_curriculum.setdefault(curriculum_id, {})
+        for cid in course_ids or []:
+            raw = str(cid)
+            code = normalized.get(raw)
+            if code is None:
+                code = normalized[raw] = normalize_course_code(raw)
+            bucket[code] = bucket.get(code, 0) + 1
+            totals[code] = totals.get(code, 0) + 1
+
+    for row in rows:
+        curriculum_id = row.get("curriculum_id")
+        _count(index.cursando, index.total_cursando, curriculum_id, row.get("in_progress_courses"))
+        _count(index.planned, index.total_planned, curriculum_id, row.get("planned_courses"))
+    return index
+
+
+def build_progress_index_from_counts(rows: Iterable[dict]) -> ProgressIndex:
+    """ProgressIndex from per-(curriculum, course) counts (data/platform_counts.py)."""
+    index = ProgressIndex()
+    normalized: dict[str, str] = {}
+    for row in rows:
+        curriculum_id = row.get("curriculum_id")
+        raw = str(row.get("course_code", ""))
+        code = normalized.get(raw)
+        if code is None:
+            code = normalized[raw] = normalize_course_code(raw)
+        for by_curriculum, totals, n in (
+            (index.cursando, index.total_cursando, int(row.get("in_progress") or 0)),
+            (index.planned, index.total_planned, int(row.get("planned") or 0)),
+        ):
+            bucket = by_curriculum.setdefault(curriculum_id, {})
+            if n:
+                bucket[code] = bucket.get(code, 0) + n
+                totals[code] = totals.get(code, 0) + n
+    return index
+
+
+def load_progress_index(progress_path: Path | None = None) -> ProgressIndex:
+    """
+    Prefers the exported platform counts (already aggregated per curriculum course) over
+    the raw user_progress dump, unless the dump is newer or `progress_path` is given.
+    Either is read from its Parquet twin when fresh (data/columnar.py).
+    """
+    path = progress_path or OUTPUT_DIR / "user_progress.json"
+    counts_path = platform_counts_path()
+    if progress_path is None and counts_path.exists():
+        if not path.exists() or counts_path.stat().st_mtime >= path.stat().st_mtime:
+            return build_progress_index_from_counts(iter_platform_counts(counts_path))
+    # Streamed: only the counts are kept, never the rows
+    return build_progress_index(
+        iter_table_rows(path, ("curriculum_id", "in_progress_courses", "planned_courses"))
+    )
+
+
 def load_platform_counts(
     progress_path: Path | None = None,
     *,
     curriculum_id: str | None = None,
 ) -> tuple[dict[str, int], dict[str, int]]:
     """Returns (cursando, planned_next) by normalized offer code."""
-    path = progress_path or OUTPUT_DIR / "user_progress.json"
-    if not path.exists():
-        return {}, {}
-
-    with open(path, encoding="utf-8") as f:
-        rows = json.load(f)
-
-    cursando: dict[str, int] = defaultdict(int)
-    planned: dict[str, int] = defaultdict(int)
-    for row in rows:
-        if curriculum_id and row.get("curriculum_id") != curriculum_id:
-            continue
-        for cid in row.get("in_progress_courses") or []:
-            cursando[normalize_course_code(str(cid))] += 1
-        for cid in row.get("planned_courses") or []:
-            planned[normalize_course_code(str(cid))] += 1
-    return dict(cursando), dict(planned)
+    return load_progress_index(progress_path).counts_for(curriculum_id)
 
 
 def _platform_by_course_id(
@@ -83,6 +156,217 @@ def _platform_by_course_id(
     return cursando, planned
 
 
+def _curriculum_history_stats(
+    courses: list[dict],
+    global_stats: dict[str, CourseHistoryStats],
+    history_index: HistoryIndex,
+    *,
+    target_period_code: str | None,
+    calendar: AcademicCalendar,
+) -> dict[str, CourseHistoryStats]:
+    """Global stats with verano-block courses re-aggregated on their summer basis."""
+    verano_ids = {c["id"] for c in courses if _is_verano_block(c.get("block"))}
+    history_stats = dict(global_stats)
+    for course in courses:
+        offer = normalize_course_code(course["id"])
+        if course["id"] not in verano_ids:
+            if offer in global_stats:
+                history_stats[offer] = global_stats[offer]
+            continue
+        # A handful of rows per course: the row engine beats building a frame
+        partial = aggregate_history_rows(
+            history_index.rows_for_course(offer),
+            target_period_code=target_period_code,
+            calendar=calendar,
+            is_verano_course=True,
+            engine="python",
+        )
+        if offer in partial:
+            history_stats[offer] = partial[offer]
+    return history_stats
+
+
+@dataclass
+class _FeatureContext:
+    """Run-wide inputs shared read-only by every curriculum (and every worker process)."""
+
+    faculty: str | None
+    rate_sets: list[TransitionRateTable | None]
+    target: str
+    current_period: str
+    calendar: AcademicCalendar
+    history_index: HistoryIndex
+    global_stats: dict[str, CourseHistoryStats]
+    progress_index: ProgressIndex
+
+
+@dataclass
+class _CourseInputs:
+    course_id: str
+    offer_code: str
+    title: str
+    hist: CourseHistoryStats | None
+    planned_count: int
+    in_progress_count: int
+    actual_at_target: int
+    graph_meta: dict
+
+
+@dataclass
+class _CurriculumInputs:
+    """Everything per curriculum that does not depend on transition rates."""
+
+    curriculum_id: str
+    faculty: str
+    graph: CurriculumGraph
+    hist_seeds: dict[str, float]
+    cursando_seeds: dict[str, float]
+    courses: list[_CourseInputs]
+
+
+def _curriculum_inputs(
+    ctx: _FeatureContext, curriculum_id: str, courses: list[dict]
+) -> _CurriculumInputs:
+    cursando_offer, planned_offer = ctx.progress_index.counts_for(curriculum_id)
+
+    history_stats = _curriculum_history_stats(
+        courses,
+        ctx.global_stats,
+        ctx.history_index,
+        target_period_code=ctx.target,
+        calendar=ctx.calendar,
+    )
+
+    graph = build_curriculum_graph(courses)
+    nx_graph = build_graph(courses, graph.prereq_edges)
+    feats = graph_features(nx_graph)
+    cursando_by_id, planned_by_id = _platform_by_course_id(
+        courses, cursando_offer, planned_offer
+    )
+
+    course_inputs: list[_CourseInputs] = []
+    for course in courses:
+        course_id = course["id"]
+        if ctx.faculty and not course_id.startswith(ctx.faculty):
+            continue
+
+        offer_code = normalize_course_code(course_id)
+        hist = history_stats.get(offer_code)
+
+        actual_at_target = 0
+        if ctx.target and hist:
+            for p in hist.periods:
+                if p.period_code == ctx.target:
+                    actual_at_target = p.total_students
+                    break
+
+        course_inputs.append(
+            _CourseInputs(
+                course_id=course_id,
+                offer_code=offer_code,
+                title=course.get("title", offer_code),
+                hist=hist,
+                planned_count=planned_by_id.get(course_id, 0),
+                in_progress_count=cursando_by_id.get(course_id, 0),
+                actual_at_target=actual_at_target,
+                graph_meta=feats.get(course_id, {}),
+            )
+        )
+
+    return _CurriculumInputs(
+        curriculum_id=curriculum_id,
+        faculty=faculty_from_curriculum_id(curriculum_id),
+        graph=graph,
+        hist_seeds=build_historical_seeds(courses, history_stats),
+        cursando_seeds={k: float(v) for k, v in cursando_by_id.items()},
+        courses=course_inputs,
+    )
+
+
+def _records_for_rates(
+    ctx: _FeatureContext,
+    inputs: _CurriculumInputs,
+    rates: TransitionRateTable | None,
+) -> list[dict]:
+    """Propagation and demand formula for one rate set over prepared curriculum inputs."""
+    inflow_hist, inflow_curs, total_inflow = propagate_demand_from_sources(
+        inputs.graph,
+        inputs.hist_seeds,
+        inputs.cursando_seeds,
+        rates=rates,
+    )
+
+    records: list[dict] = []
+    for c in inputs.courses:
+        hist = c.hist
+        h_inflow = inflow_hist.get(c.course_id, 0.0)
+        c_inflow = inflow_curs.get(c.course_id, 0.0)
+
+        estimated_students, suggested_sections, trend = compute_demand_prediction(
+            float(c.planned_count),
+            h_inflow,
+            c_inflow,
+            hist,
+        )
+
+        meta_g = c.graph_meta
+        records.append(
+            {
+                "course_id": c.course_id,
+                "offer_code": c.offer_code,
+                "title": c.title,
+                "faculty": inputs.faculty,
+                "curriculum_id": inputs.curriculum_id,
+                "planned_count": c.planned_count,
+                "in_progress_count": c.in_progress_count,
+                "inflow_from_history": round(h_inflow, 2),
+                "inflow_from_cursando": round(c_inflow, 2),
+                "propagated_students": round(total_inflow.get(c.course_id, 0.0), 2),
+                "avg_historical": hist.avg_sections if hist else 0.0,
+                "avg_students": hist.avg_students if hist else 0.0,
+                "estimated_next_students": hist.estimated_next_students if hist else 0,
+                "max_historical": hist.max_sections if hist else 0,
+                "num_periods": hist.num_periods if hist else 0,
+                "last_regular_students": hist.last_regular_students if hist else 0,
+                "summer_to_regular_rate": hist.summer_to_regular_rate if hist else 0.0,
+                "estimated_students": estimated_students,
+                "suggested_sections": suggested_sections,
+                "actual_students_at_target": c.actual_at_target,
+                "target_period_code": ctx.target,
+                "current_period_code": ctx.current_period,
+                "trend": trend,
+                "in_degree": meta_g.get("in_degree", 0),
+                "out_degree": meta_g.get("out_degree", 0),
+                "semester": meta_g.get("semester", 0),
+                "credits": meta_g.get("credits", 0),
+                "unlocks_count": meta_g.get("unlocks_count", 0),
+            }
+        )
+
+    return records
+
+
+def _curriculum_records(
+    ctx: _FeatureContext, curriculum_id: str, courses: list[dict]
+) -> list[list[dict]]:
+    """Records for every rate set in ctx.rate_sets, sharing the rate-independent inputs."""
+    inputs = _curriculum_inputs(ctx, curriculum_id, courses)
+    return [_records_for_rates(ctx, inputs, rates) for rates in ctx.rate_sets]
+
+
+_WORKER_CONTEXT: _FeatureContext | None = None
+
+
+def _init_feature_worker(ctx: _FeatureContext) -> None:
+    global _WORKER_CONTEXT
+    _WORKER_CONTEXT = ctx
+
+
+def _worker_curriculum_records(item: tuple[str, list[dict]]) -> list[list[dict]]:
+    assert _WORKER_CONTEXT is not None
+    return _curriculum_records(_WORKER_CONTEXT, *item)
+
+
 def resolve_prediction_context(
     metadata: dict | None = None,
 ) -> tuple[str, str, str]:
@@ -101,130 +385,109 @@ def build_feature_frame(
     use_calibrated_rates: bool = True,
     target_period_code: str | None = None,
     history_rows: list[dict] | None = None,
+    history_index: HistoryIndex | None = None,
+    history_store: HistoryStore | None = None,
+    progress_index: ProgressIndex | None = None,
+    workers: int = 1,
 ) -> pd.DataFrame:
-    """Hybrid estimator aligned with TeacherDashboard + optional GBR features."""
+    """
+    Hybrid estimator aligned with TeacherDashboard + optional GBR features.
+    Pass `history_index` / `progress_index` to reuse inputs loaded once across runs, or a
+    `history_store` to use only its rows before the target period;
+    `workers > 1` builds curricula in a process pool with identical output.
+    """
     if rates is None and use_calibrated_rates:
         rates = load_transition_rates()
-
+    return build_feature_frames(
+        [rates],
+        faculty,
+        target_period_code=target_period_code,
+        history_rows=history_rows,
+        history_index=history_index,
+        history_store=history_store,
+        progress_index=progress_index,
+        workers=workers,
+    )[0]
+
+
+def build_feature_frames(
+    rate_sets: Sequence[TransitionRateTable | None],
+    faculty: str | None = None,
+    *,
+    target_period_code: str | None = None,
+    history_rows: list[dict] | None = None,
+    history_index: HistoryIndex | None = None,
+    history_store: HistoryStore | None = None,
+    history_stats: dict[str, CourseHistoryStats] | None = None,
+    progress_index: ProgressIndex | None = None,
+    workers: int = 1,
+) -> list[pd.DataFrame]:
+    """
+    One feature frame per rate set (None = fixed priors). History stats, platform counts,
+    graphs and seeds are built once per curriculum; only propagation and the demand
+    formula run per rate set. Each frame equals build_feature_frame(rates=...).
+    `history_stats` supplies the target's aggregated stats (e.g. PrefixHistoryStats).
+    """
     meta = load_offer_metadata()
     current_period, inferred_target, target_label = resolve_prediction_context(meta)
     target = target_period_code or inferred_target
 
     cal = build_calendar()
-    rows = history_rows if history_rows is not None else load_history_rows()
-
-    records: list[dict] = []
-
+    if history_index is None and history_store is not None:
+        history_index = history_store.before(target)
+    if history_index is None:
+        history_index = build_history_index(history_rows)
+    if progress_index is None:
+        progress_index = load_progress_index()
+
+    # Identical for every malla: aggregate the full history once per run
+    global_stats = history_stats
+    if global_stats is None:
+        global_stats = history_index.aggregate(target_period_code=target, calendar=cal)
+
+    ctx = _FeatureContext(
+        faculty=faculty,
+        rate_sets=list(rate_sets),
+        target=target,
+        current_period=current_period,
+        calendar=cal,
+        history_index=history_index,
+        global_stats=global_stats,
+        progress_index=progress_index,
+    )
+
+    work: list[tuple[str, list[dict]]] = []
     for curriculum_id, data in iter_curricula():
-        fac = faculty_from_curriculum_id(curriculum_id)
-        if faculty and fac != faculty:
+        if faculty and faculty_from_curriculum_id(curriculum_id) != faculty:
             continue
-
         courses = data.get("courses", [])
-        if not courses:
-            continue
-
-        cursando_offer, planned_offer = load_platform_counts(curriculum_id=curriculum_id)
-
-        # Per-malla history with verano-block awareness
-        verano_ids = {c["id"] for c in courses if _is_verano_block(c.get("block"))}
-        history_stats: dict = {}
-        for course in courses:
-            offer = normalize_course_code(course["id"])
-            is_verano = course["id"] in verano_ids
-            partial = aggregate_history_rows(
-                [r for r in rows if normalize_course_code(str(r.get("course_code", ""))) == offer],
-                target_period_code=target,
-                calendar=cal,
-                is_verano_course=is_verano,
-            )
-            if offer in partial:
-                history_stats[offer] = partial[offer]
-
-        # Also include global stats for courses not in malla loop above
-        global_stats = aggregate_history_rows(rows, target_period_code=target, calendar=cal)
-        for code, stat in global_stats.items():
-            history_stats.setdefault(code, stat)
-
-        graph = build_curriculum_graph(courses)
-        nx_graph = build_graph(courses)
-        feats = graph_features(nx_graph)
-
-        hist_seeds = build_historical_seeds(courses, history_stats)
-        cursando_by_id, planned_by_id = _platform_by_course_id(
-            courses, cursando_offer, planned_offer
-        )
-        inflow_hist, inflow_curs, total_inflow = propagate_demand_from_sources(
-            graph,
-            hist_seeds,
-            {k: float(v) for k, v in cursando_by_id.items()},
-            rates=rates,
-        )
-
-        for course in courses:
-            course_id = course["id"]
-            if faculty and not course_id.startswith(faculty):
-                continue
-
-            offer_code = normalize_course_code(course_id)
-            hist = history_stats.get(offer_code)
-            planned_count = planned_by_id.get(course_id, 0)
-            h_inflow = inflow_hist.get(course_id, 0.0)
-            c_inflow = inflow_curs.get(course_id, 0.0)
-
-            estimated_students, suggested_sections, trend = compute_demand_prediction(
-                float(planned_count),
-                h_inflow,
-                c_inflow,
-                hist,
-            )
-
-            actual_at_target = 0
-            if target and hist:
-                for p in hist.periods:
-                    if p.period_code == target:
-                        actual_at_target = p.total_students
-                        break
-
-            meta_g = feats.get(course_id, {})
-            records.append(
-                {
-                    "course_id": course_id,
-                    "offer_code": offer_code,
-                    "title": course.get("title", offer_code),
-                    "faculty": fac,
-                    "curriculum_id": curriculum_id,
-                    "planned_count": planned_count,
-                    "in_progress_count": cursando_by_id.get(course_id, 0),
-                    "inflow_from_history": round(h_inflow, 2),
-                    "inflow_from_cursando": round(c_inflow, 2),
-                    "propagated_students": round(total_inflow.get(course_id, 0.0), 2),
-                    "avg_historical": hist.avg_sections if hist else 0.0,
-                    "avg_students": hist.avg_students if hist else 0.0,
-                    "estimated_next_students": hist.estimated_next_students if hist else 0,
-                    "max_historical": hist.max_sections if hist else 0,
-                    "num_periods": hist.num_periods if hist else 0,
-                    "last_regular_students": hist.last_regular_students if hist else 0,
-                    "summer_to_regular_rate": hist.summer_to_regular_rate if hist else 0.0,
-                    "estimated_students": estimated_students,
-                    "suggested_sections": suggested_sections,
-                    "actual_students_at_target": actual_at_target,
-                    "target_period_code": target,
-                    "current_period_code": current_period,
-                    "trend": trend,
-                    "in_degree": meta_g.get("in_degree", 0),
-                    "out_degree": meta_g.get("out_degree", 0),
-                    "semester": meta_g.get("semester", 0),
-                    "credits": meta_g.get("credits", 0),
-                    "unlocks_count": meta_g.get("unlocks_count", 0),
-                }
-            )
-
-    df = pd.DataFrame(records)
-    df.attrs["target_period_code"] = target
-    df.attrs["target_period_label"] = target_label
-    df.attrs["current_period_code"] = current_period
-    return df
+        if courses:
+            work.append((curriculum_id, courses))
+
+    records: list[list[dict]] = [[] for _ in ctx.rate_sets]
+    if workers > 1 and len(work) > 1:
+        # Inputs ship once per worker; map() yields in submission order, so the
+        # merged records match the serial path exactly.
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(work)),
+            initializer=_init_feature_worker,
+            initargs=(ctx,),
+        ) as pool:
+            chunks = list(pool.map(_worker_curriculum_records, work))
+    else:
+        chunks = [_curriculum_records(ctx, *item) for item in work]
+    for chunk in chunks:
+        for dest, part in zip(records, chunk):
+            dest.extend(part)
+
+    frames: list[pd.DataFrame] = []
+    for rows in records:
+        df = pd.DataFrame(rows)
+        df.attrs["target_period_code"] = target
+        df.attrs["target_period_label"] = target_label
+        df.attrs["current_period_code"] = current_period
+        frames.append(df)
+    return frames
 
 
 def load_planned_counts(progress_path: Path | None = None) -> dict[str, int]:
@@ -0,0 +1,340 @@
+"""Vectorized transition calibration — period pairs as slices of a course × period matrix."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass
+
+import numpy as np
+
+from config import TRANSITION_SHRINKAGE_ALPHA
+from features.codes import normalize_course_code
+from features.history_stats import _row_period_code, aggregate_history_rows, load_history_rows
+from features.period_calendar import AcademicCalendar, build_calendar
+from features.transition_calibration import (
+    CalibrationAccumulators,
+    EdgeType,
+    TransitionRateTable,
+    accumulate_transition_pairs,
+    build_rate_table,
+)
+from graph.curriculum import iter_curricula
+from graph.propagation import build_curriculum_graph
+
+
+@dataclass
+class EnrollmentMatrix:
+    """
+    Teoría students per (offer code, period code). The last row and column are all
+    zeros and stand in for offers or periods missing from history.
+    """
+
+    offers: dict[str, int]
+    periods: dict[str, int]
+    values: np.ndarray
+
+    def row(self, offer_code: str) -> int:
+        return self.offers.get(offer_code, len(self.offers))
+
+    def col(self, period_code: str) -> int:
+        return self.periods.get(period_code, len(self.periods))
+
+
+def build_enrollment_matrix(history_by_offer: dict) -> EnrollmentMatrix:
+    offers = {code: i for i, code in enumerate(history_by_offer)}
+    periods = {
+        code: i
+        for i, code in enumerate(
+            sorted({p.period_code for h in history_by_offer.values() for p in h.periods})
+        )
+    }
+    values = np.zeros((len(offers) + 1, len(periods) + 1))
+    for code, hist in history_by_offer.items():
+        row = offers[code]
+        for p in hist.periods:
+            values[row, periods[p.period_code]] = p.total_students
+    return EnrollmentMatrix(offers=offers, periods=periods, values=values)
+
+
+@dataclass
+class CalibrationEdges:
+    """Every curriculum prerequisite edge, in the loop engine's visiting order."""
+
+    keys: list[tuple[str, str, str, EdgeType]]
+    from_offers: list[str]
+    to_offers: list[str]
+    deltas: np.ndarray
+
+
+def collect_calibration_edges() -> CalibrationEdges:
+    keys: list[tuple[str, str, str, EdgeType]] = []
+    from_offers: list[str] = []
+    to_offers: list[str] = []
+    deltas: list[int] = []
+    for curriculum_id, data in iter_curricula():
+        courses = data.get("courses", [])
+        if not courses:
+            continue
+        graph = build_curriculum_graph(courses)
+        edges = graph.edge_table()
+        for from_id, to_id in graph.prereq_edges:
+            i = edges.index[(from_id, to_id)]
+            keys.append((from_id, to_id, curriculum_id, edges.edge_type(i)))
+            from_offers.append(normalize_course_code(from_id))
+            to_offers.append(normalize_course_code(to_id))
+            deltas.append(int(edges.semester_delta[i]))
+    return CalibrationEdges(
+        keys=keys,
+        from_offers=from_offers,
+        to_offers=to_offers,
+        deltas=np.asarray(deltas, dtype=np.int64),
+    )
+
+
+def _pair_contributions(
+    values: np.ndarray,
+    from_rows: np.ndarray,
+    to_rows: np.ndarray,
+    src_cols: list[int],
+    tgt_cols: list[int],
+    onehot: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (source, target, n_pairs) per edge and horizon: each period pair's sums land in the
+    horizon column of `onehot` (pairs × horizons). Only pairs with src > 0 count.
+    """
+    src = values[np.ix_(from_rows, src_cols)]
+    tgt = values[np.ix_(to_rows, tgt_cols)]
+    counted = src > 0
+    return (
+        np.where(counted, src, 0.0) @ onehot,
+        np.where(counted, tgt, 0.0) @ onehot,
+        counted.astype(float) @ onehot,
+    )
+
+
+def _cumulative(per_horizon: np.ndarray) -> np.ndarray:
+    """Prefix sums along horizons, with a leading all-zero column for "no pairs yet"."""
+    out = np.zeros((per_horizon.shape[0], per_horizon.shape[1] + 1))
+    np.cumsum(per_horizon, axis=1, out=out[:, 1:])
+    return out
+
+
+@dataclass
+class CalibrationPrefix:
+    """
+    Per-edge pair sums accumulated over horizons (the latest period a pair reads: the
+    target regular period, or the regular_10 after a summer). Column k holds every pair
+    whose horizon is < horizons[k], so any max_period cutoff is one O(edges) lookup.
+    """
+
+    edges: CalibrationEdges
+    horizons: list[str]
+    source: np.ndarray
+    target: np.ndarray
+    n_pairs: np.ndarray
+    summer_source: np.ndarray
+    summer_target: np.ndarray
+    summer_pairs: np.ndarray
+
+    def column(self, max_period: str | None = None) -> int:
+        if not max_period:
+            return len(self.horizons)
+        return bisect_left(self.horizons, max_period)
+
+    def accumulators(self, max_period: str | None = None) -> CalibrationAccumulators:
+        k = self.column(max_period)
+        source, target, n_pairs = self.source[:, k], self.target[:, k], self.n_pairs[:, k]
+        s_source, s_target = self.summer_source[:, k], self.summer_target[:, k]
+        s_pairs = self.summer_pairs[:, k]
+
+        # Insert in edge order so dict order (and the saved JSON) matches the loop engine
+        acc = CalibrationAccumulators()
+        for i in np.flatnonzero((n_pairs > 0) | (s_pairs > 0)):
+            key = self.edges.keys[i]
+            if n_pairs[i]:
+                for entry in (acc.edge[key], acc.by_type[key[3]]):
+                    entry.source_students += float(source[i])
+                    entry.target_students += float(target[i])
+                    entry.n_pairs += int(n_pairs[i])
+            if s_pairs[i]:
+                entry = acc.summer[self.edges.from_offers[i]]
+                entry.source_students += float(s_source[i])
+                entry.target_students += float(s_target[i])
+                entry.n_pairs += int(s_pairs[i])
+        return acc
+
+    def rate_table(
+        self,
+        max_period: str | None = None,
+        alpha: float = TRANSITION_SHRINKAGE_ALPHA,
+    ) -> TransitionRateTable:
+        return build_rate_table(self.accumulators(max_period), alpha)
+
+
+def build_calibration_prefix(
+    history_by_offer: dict,
+    cal: AcademicCalendar,
+    *,
+    edges: CalibrationEdges | None = None,
+) -> CalibrationPrefix:
+    """
+    Compute every edge's period-pair contributions once over the full history. Pairs only
+    read periods up to their horizon, so slicing at a cutoff equals calibrating on the
+    rows before it.
+    """
+    edges = edges or collect_calibration_edges()
+    enrollment = build_enrollment_matrix(history_by_offer)
+    n_edges = len(edges.keys)
+    from_rows = np.asarray([enrollment.row(o) for o in edges.from_offers], dtype=np.int64)
+    to_rows = np.asarray([enrollment.row(o) for o in edges.to_offers], dtype=np.int64)
+    zero_col = len(enrollment.periods)
+    regular_codes = cal.regular_codes()
+
+    regular_pairs: dict[int, list[tuple[int, int, str]]] = {}
+    for delta in np.unique(edges.deltas):
+        pairs = regular_pairs.setdefault(int(delta), [])
+        for src_period in regular_codes:
+            tgt_period = cal.advance_regular(src_period, int(delta))
+            if not tgt_period:
+                continue
+            col = enrollment.col(src_period)
+            if col != zero_col:
+                pairs.append((col, enrollment.col(tgt_period), max(src_period, tgt_period)))
+
+    # Summer → next regular_10 for target course
+    summer_pairs: list[tuple[int, int, str]] = []
+    for reg_code in regular_codes:
+        if cal.get(reg_code) and cal.get(reg_code).kind != "regular_10":  # type: ignore[union-attr]
+            continue
+        summer_code = cal.summer_before_regular(reg_code)
+        if not summer_code:
+            continue
+        col = enrollment.col(summer_code)
+        if col != zero_col:
+            summer_pairs.append((col, enrollment.col(reg_code), reg_code))
+
+    horizons = sorted(
+        {h for pairs in regular_pairs.values() for _, _, h in pairs}
+        | {h for _, _, h in summer_pairs}
+    )
+    position = {h: i for i, h in enumerate(horizons)}
+
+    def onehot(pairs: list[tuple[int, int, str]]) -> np.ndarray:
+        mat = np.zeros((len(pairs), len(horizons)))
+        mat[np.arange(len(pairs)), [position[h] for _, _, h in pairs]] = 1.0
+        return mat
+
+    source = np.zeros((n_edges, len(horizons)))
+    target = np.zeros((n_edges, len(horizons)))
+    n_pairs = np.zeros((n_edges, len(horizons)))
+    for delta, pairs in regular_pairs.items():
+        if not pairs:
+            continue
+        sel = np.flatnonzero(edges.deltas == delta)
+        source[sel], target[sel], n_pairs[sel] = _pair_contributions(
+            enrollment.values,
+            from_rows[sel],
+            to_rows[sel],
+            [s for s, _, _ in pairs],
+            [t for _, t, _ in pairs],
+            onehot(pairs),
+        )
+
+    if summer_pairs:
+        s_source, s_target, s_pairs = _pair_contributions(
+            enrollment.values,
+            from_rows,
+            to_rows,
+            [s for s, _, _ in summer_pairs],
+            [t for _, t, _ in summer_pairs],
+            onehot(summer_pairs),
+        )
+    else:
+        s_source = s_target = s_pairs = np.zeros((n_edges, len(horizons)))
+
+    return CalibrationPrefix(
+        edges=edges,
+        horizons=horizons,
+        source=_cumulative(source),
+        target=_cumulative(target),
+        n_pairs=_cumulative(n_pairs).astype(np.int64),
+        summer_source=_cumulative(s_source),
+        summer_target=_cumulative(s_target),
+        summer_pairs=_cumulative(s_pairs).astype(np.int64),
+    )
+
+
+def accumulate_transition_pairs_matrix(
+    history_by_offer: dict,
+    cal: AcademicCalendar,
+    *,
+    max_period: str | None = None,
+    edges: CalibrationEdges | None = None,
+) -> CalibrationAccumulators:
+    """
+    Matrix engine: same sums as accumulate_transition_pairs, computed per semester delta
+    as one gather over (edges × period pairs) instead of a Python loop per pair.
+    """
+    prefix = build_calibration_prefix(history_by_offer, cal, edges=edges)
+    return prefix.accumulators(max_period)
+
+
+def compare_calibration_engines(
+    history_rows: list[dict],
+    calendar: AcademicCalendar | None = None,
+    *,
+    max_period: str | None = None,
+) -> list[str]:
+    """Rate table entries that differ between the loop and matrix engines."""
+    cal = calendar or build_calendar()
+    stats = aggregate_history_rows(history_rows)
+    expected = build_rate_table(accumulate_transition_pairs(stats, cal, max_period=max_period))
+    actual = build_rate_table(
+        accumulate_transition_pairs_matrix(stats, cal, max_period=max_period)
+    )
+    return _mismatched_sections(expected, actual)
+
+
+def compare_prefix_cutoffs(
+    history_rows: list[dict],
+    cutoffs: list[str],
+    calendar: AcademicCalendar | None = None,
+) -> dict[str, list[str]]:
+    """
+    Cutoffs whose prefix-sliced rate table differs from calibrating from scratch on the
+    rows before that cutoff (as run_backtest used to per holdout).
+    """
+    cal = calendar or build_calendar()
+    prefix = build_calibration_prefix(aggregate_history_rows(history_rows), cal)
+    mismatched: dict[str, list[str]] = {}
+    for cutoff in cutoffs:
+        train_rows = [r for r in history_rows if _row_period_code(r) < cutoff]
+        expected = build_rate_table(
+            accumulate_transition_pairs(aggregate_history_rows(train_rows), cal, max_period=cutoff)
+        )
+        diff = _mismatched_sections(expected, prefix.rate_table(cutoff))
+        if diff:
+            mismatched[cutoff] = diff
+    return mismatched
+
+
+def _mismatched_sections(expected: TransitionRateTable, actual: TransitionRateTable) -> list[str]:
+    exp_payload, act_payload = expected.to_payload(), actual.to_payload()
+    return [
+        section
+        for section in ("by_edge", "by_type", "summer_rates")
+        if list(exp_payload[section].items()) != list(act_payload[section].items())
+    ]
+
+
+if __name__ == "__main__":
+    history = load_history_rows()
+    cal = build_calendar()
+    target, _ = cal.infer_target_period(None)
+    for cutoff in (None, target):
+        diff = compare_calibration_engines(history, cal, max_period=cutoff)
+        print(f"max_period={cutoff}: " + (f"mismatched {diff}" if diff else "identical"))
+    cutoffs = [c for c in cal.regular_codes() if c >= "202510"]
+    diff = compare_prefix_cutoffs(history, cutoffs, cal)
+    print(f"prefix cutoffs {cutoffs}: " + (f"mismatched {diff}" if diff else "identical"))
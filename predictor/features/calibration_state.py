@@ -0,0 +1,302 @@
+"""Persisted calibration accumulators — incremental transition calibration."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+from config import CURRICULA_DIR, TRANSITION_ACCUMULATORS_JSON, TRANSITION_SHRINKAGE_ALPHA
+from features.calibration_matrix import (
+    CalibrationEdges,
+    accumulate_transition_pairs_matrix,
+    collect_calibration_edges,
+)
+from features.history_stats import aggregate_history_rows, load_history_rows
+from features.period_calendar import AcademicCalendar, build_calendar
+from features.transition_calibration import (
+    CalibrationAccumulators,
+    RateAccumulator,
+    TransitionRateTable,
+    _cupo_by_period,
+    build_rate_table,
+)
+
+# ("regular", semester_delta, src, tgt) or ("summer", 0, summer_code, regular_10_code)
+PeriodPair = tuple[str, int, str, str]
+
+
+@dataclass
+class CalibrationState:
+    """
+    RateAccumulator sums from a full-history calibration plus what they were built from:
+    the curricula fingerprint, per-period history checksums and the counted period pairs.
+    """
+
+    curricula_fingerprint: str
+    period_checksums: dict[str, str]
+    pairs: set[PeriodPair]
+    acc: CalibrationAccumulators = field(default_factory=CalibrationAccumulators)
+    updated_at: str = ""
+
+    def to_payload(self) -> dict:
+        return {
+            "updated_at": self.updated_at,
+            "curricula_fingerprint": self.curricula_fingerprint,
+            "period_checksums": self.period_checksums,
+            "pairs": [list(p) for p in sorted(self.pairs)],
+            "edge": [
+                {
+                    "from_id": from_id,
+                    "to_id": to_id,
+                    "curriculum_id": curriculum_id,
+                    "edge_type": et,
+                    **_accumulator_dict(entry),
+                }
+                for (from_id, to_id, curriculum_id, et), entry in self.acc.edge.items()
+            ],
+            "by_type": {et: _accumulator_dict(e) for et, e in self.acc.by_type.items()},
+            "summer": {offer: _accumulator_dict(e) for offer, e in self.acc.summer.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> CalibrationState:
+        acc = CalibrationAccumulators()
+        for row in data.get("edge") or []:
+            key = (row["from_id"], row["to_id"], row["curriculum_id"], row["edge_type"])
+            acc.edge[key] = _accumulator_from(row)
+        for et, row in (data.get("by_type") or {}).items():
+            acc.by_type[et] = _accumulator_from(row)
+        for offer, row in (data.get("summer") or {}).items():
+            acc.summer[offer] = _accumulator_from(row)
+        return cls(
+            curricula_fingerprint=data.get("curricula_fingerprint", ""),
+            # Files from before per-course digests hold [courses, students]; they never
+            # match a digest, so the first incremental run rebuilds from scratch
+            period_checksums={k: str(v) for k, v in (data.get("period_checksums") or {}).items()},
+            pairs={(p[0], int(p[1]), p[2], p[3]) for p in data.get("pairs") or []},
+            acc=acc,
+            updated_at=data.get("updated_at", ""),
+        )
+
+
+def _accumulator_dict(entry: RateAccumulator) -> dict:
+    return {
+        "source_students": entry.source_students,
+        "target_students": entry.target_students,
+        "n_pairs": entry.n_pairs,
+    }
+
+
+def _accumulator_from(row: dict) -> RateAccumulator:
+    return RateAccumulator(
+        source_students=float(row.get("source_students", 0)),
+        target_students=float(row.get("target_students", 0)),
+        n_pairs=int(row.get("n_pairs", 0)),
+    )
+
+
+def curricula_fingerprint(directory: Path | None = None) -> str:
+    """Content hash of every Malla-*.json; any curriculum edit forces a full rebuild."""
+    digest = hashlib.sha256()
+    for path in sorted((directory or CURRICULA_DIR).glob("Malla-*.json")):
+        digest.update(path.name.encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def period_checksums(history_by_offer: dict) -> dict[str, str]:
+    """
+    Digest of the sorted (course, students) pairs per history period, to detect
+    re-scraped periods — including students moved between courses at equal totals.
+    """
+    by_period: dict[str, list[tuple[str, int]]] = {}
+    for offer, hist in history_by_offer.items():
+        for p in hist.periods:
+            by_period.setdefault(p.period_code, []).append((str(offer), int(p.total_students)))
+    return {
+        code: hashlib.sha256(json.dumps(sorted(pairs)).encode("utf-8")).hexdigest()
+        for code, pairs in sorted(by_period.items())
+    }
+
+
+def candidate_pairs(cal: AcademicCalendar, deltas: set[int]) -> list[PeriodPair]:
+    """Every period pair a full calibration visits (max_period=None)."""
+    pairs: list[PeriodPair] = []
+    regular_codes = cal.regular_codes()
+    for delta in sorted(deltas):
+        for src_period in regular_codes:
+            tgt_period = cal.advance_regular(src_period, delta)
+            if tgt_period:
+                pairs.append(("regular", delta, src_period, tgt_period))
+    for reg_code in regular_codes:
+        summer_code = cal.summer_before_regular(reg_code)
+        if summer_code:
+            pairs.append(("summer", 0, summer_code, reg_code))
+    return pairs
+
+
+def _contribution(src_students: int, tgt_students: int) -> tuple[int, int, int]:
+    return (src_students, tgt_students, 1) if src_students > 0 else (0, 0, 0)
+
+
+def _add(entry: RateAccumulator, src: int, tgt: int, n: int) -> None:
+    entry.source_students += src
+    entry.target_students += tgt
+    entry.n_pairs += n
+
+
+def _edge_ordered(acc: CalibrationAccumulators, edges: CalibrationEdges) -> CalibrationAccumulators:
+    """Reinsert keys in curriculum edge order, as a full calibration would."""
+    ordered = CalibrationAccumulators()
+    for key, offer in zip(edges.keys, edges.from_offers):
+        if key in acc.edge and key not in ordered.edge:
+            ordered.edge[key] = acc.edge[key]
+            if key[3] not in ordered.by_type:
+                ordered.by_type[key[3]] = acc.by_type[key[3]]
+        if offer in acc.summer and offer not in ordered.summer:
+            ordered.summer[offer] = acc.summer[offer]
+    return ordered
+
+
+def build_calibration_state(
+    history_by_offer: dict,
+    cal: AcademicCalendar,
+    *,
+    edges: CalibrationEdges | None = None,
+    fingerprint: str | None = None,
+) -> CalibrationState:
+    edges = edges or collect_calibration_edges()
+    return CalibrationState(
+        curricula_fingerprint=fingerprint or curricula_fingerprint(),
+        period_checksums=period_checksums(history_by_offer),
+        pairs=set(candidate_pairs(cal, {int(d) for d in edges.deltas})),
+        acc=accumulate_transition_pairs_matrix(history_by_offer, cal, edges=edges),
+        updated_at=datetime.now(timezone.utc).isoformat(),
+    )
+
+
+def update_calibration_state(
+    state: CalibrationState,
+    history_by_offer: dict,
+    cal: AcademicCalendar,
+    *,
+    edges: CalibrationEdges | None = None,
+    fingerprint: str | None = None,
+) -> CalibrationState | None:
+    """
+    Add only the period pairs that are new or involve newly arrived periods. Pairs counted
+    before a period arrived read it as 0 students, so that earlier contribution is
+    swapped for the current one. Returns None when a full rebuild is needed: curricula
+    changed, an already-counted period's per-course totals changed, or the calendar remapped pairs.
+    """
+    if state.curricula_fingerprint != (fingerprint or curricula_fingerprint()):
+        return None
+    checksums = period_checksums(history_by_offer)
+    if any(checksums.get(code) != value for code, value in state.period_checksums.items()):
+        return None
+    edges = edges or collect_calibration_edges()
+    pairs = candidate_pairs(cal, {int(d) for d in edges.deltas})
+    if not state.pairs <= set(pairs):
+        return None
+
+    new_periods = set(checksums) - set(state.period_checksums)
+    pending_regular: dict[int, list[PeriodPair]] = {}
+    pending_summer: list[PeriodPair] = []
+    for pair in pairs:
+        kind, delta, a, b = pair
+        if pair in state.pairs and a not in new_periods and b not in new_periods:
+            continue
+        if kind == "summer":
+            pending_summer.append(pair)
+        else:
+            pending_regular.setdefault(delta, []).append(pair)
+
+    acc = state.acc
+    for key, from_offer, to_offer, delta in zip(
+        edges.keys, edges.from_offers, edges.to_offers, edges.deltas
+    ):
+        from_cupo = _cupo_by_period(history_by_offer, from_offer)
+        to_cupo = _cupo_by_period(history_by_offer, to_offer)
+        for pair in pending_regular.get(int(delta), []) + pending_summer:
+            kind, _, a, b = pair
+            src, tgt = from_cupo.get(a, 0), to_cupo.get(b, 0)
+            now = _contribution(src, tgt)
+            if pair in state.pairs:
+                before = _contribution(
+                    0 if a in new_periods else src, 0 if b in new_periods else tgt
+                )
+                now = tuple(x - y for x, y in zip(now, before))
+            if not any(now):
+                continue
+            if kind == "summer":
+                _add(acc.summer[from_offer], *now)
+            else:
+                _add(acc.edge[key], *now)
+                _add(acc.by_type[key[3]], *now)
+
+    return CalibrationState(
+        curricula_fingerprint=state.curricula_fingerprint,
+        period_checksums=checksums,
+        pairs=set(pairs),
+        acc=_edge_ordered(acc, edges),
+        updated_at=datetime.now(timezone.utc).isoformat(),
+    )
+
+
+def load_calibration_state(path: Path | None = None) -> CalibrationState | None:
+    p = path or TRANSITION_ACCUMULATORS_JSON
+    if not p.exists():
+        return None
+    with open(p, encoding="utf-8") as f:
+        return CalibrationState.from_json(json.load(f))
+
+
+def save_calibration_state(state: CalibrationState, path: Path | None = None) -> Path:
+    dest = path or TRANSITION_ACCUMULATORS_JSON
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with open(dest, "w", encoding="utf-8") as f:
+        json.dump(state.to_payload(), f)
+    return dest
+
+
+def calibrate_transitions_incremental(
+    history_rows: list[dict] | None = None,
+    calendar: AcademicCalendar | None = None,
+    *,
+    alpha: float = TRANSITION_SHRINKAGE_ALPHA,
+    state_path: Path | None = None,
+    rebuild: bool = False,
+) -> tuple[TransitionRateTable, bool]:
+    """
+    Full-history calibration that reuses the persisted accumulators. Returns the rate
+    table and whether the update was incremental (False = full rebuild).
+    """
+    cal = calendar or build_calendar()
+    stats = aggregate_history_rows(history_rows or load_history_rows())
+    edges = collect_calibration_edges()
+    fingerprint = curricula_fingerprint()
+
+    previous = None if rebuild else load_calibration_state(state_path)
+    state = (
+        update_calibration_state(previous, stats, cal, edges=edges, fingerprint=fingerprint)
+        if previous
+        else None
+    )
+    incremental = state is not None
+    if state is None:
+        state = build_calibration_state(stats, cal, edges=edges, fingerprint=fingerprint)
+    save_calibration_state(state, state_path)
+    return build_rate_table(state.acc, alpha), incremental
+
+
+if __name__ == "__main__":
+    from features.transition_calibration import save_transition_rates
+
+    table, incremental = calibrate_transitions_incremental()
+    out, pub = save_transition_rates(table)
+    mode = "incremental" if incremental else "full rebuild"
+    print(f"Calibrated {len(table.by_edge)} edges ({mode}) → {out}")
+    print(f"Public copy → {pub}")
@@ -0,0 +1,251 @@
+"""Columnar (pandas) engine for history aggregation — same results as aggregate_history_rows."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from config import STUDENTS_PER_SECTION
+from features.codes import normalize_course_code
+from features.history_stats import (
+    CourseHistoryStats,
+    PeriodOfferStats,
+    aggregate_history_rows,
+    load_history_rows,
+)
+from features.period_calendar import AcademicCalendar, build_calendar, classify_period_kind
+
+HISTORY_FRAME_COLUMNS = ["course_code", "period_code", "period", "type", "total"]
+
+
+def history_frame(rows: list[dict]) -> pd.DataFrame:
+    """
+    Typed Teoría rows: code (category), period_code, period_label, total (float).
+    Built once per history snapshot and reused by every aggregation.
+    """
+    raw = pd.DataFrame.from_records(rows, columns=HISTORY_FRAME_COLUMNS)
+    raw = raw[raw["type"] == "Teoría"]
+
+    course_code = raw["course_code"].where(raw["course_code"].notna(), "")
+    period = raw["period"].where(raw["period"].notna() & (raw["period"] != ""), "")
+    period_code = raw["period_code"].where(
+        raw["period_code"].notna() & (raw["period_code"] != ""), period
+    )
+    label = period.where(period != "", period_code)
+
+    normalized = {c: normalize_course_code(str(c)) for c in pd.unique(course_code)}
+    return pd.DataFrame(
+        {
+            "code": pd.Categorical(course_code.map(normalized)),
+            "period_code": period_code.astype(object),
+            "period_label": label.astype(object),
+            "total": pd.to_numeric(raw["total"], errors="coerce").fillna(0.0).astype(float),
+        }
+    ).reset_index(drop=True)
+
+
+def _period_table(frame: pd.DataFrame) -> pd.DataFrame:
+    """One row per (course, period), sorted by course then period code."""
+    grouped = (
+        frame.groupby(["code", "period_code"], observed=True, sort=False)
+        .agg(
+            period_label=("period_label", "first"),
+            sections=("total", "size"),
+            students=("total", "sum"),
+        )
+        .reset_index()
+    )
+    grouped["code"] = grouped["code"].astype(object)
+    grouped["total_students"] = grouped["students"].astype(np.int64)
+    grouped["sections"] = grouped["sections"].astype(np.int64)
+    kinds = {p: classify_period_kind(p) for p in pd.unique(grouped["period_code"])}
+    grouped["period_kind"] = grouped["period_code"].map(kinds)
+    grouped["is_regular"] = grouped["period_kind"].isin(["regular_10", "regular_20"])
+    grouped["is_summer"] = grouped["period_kind"] == "summer"
+    return grouped.sort_values(["code", "period_code"], kind="stable").reset_index(drop=True)
+
+
+def _basis_mask(table: pd.DataFrame, is_verano_course: bool) -> pd.Series:
+    by_code = table.groupby("code", sort=False)
+    if is_verano_course:
+        has_summer = by_code["is_summer"].transform("any")
+        return table["is_summer"] | ~has_summer
+    non_medical = table["period_kind"] != "medical_year"
+    has_regular = by_code["is_regular"].transform("any")
+    has_non_medical = non_medical.groupby(table["code"], sort=False).transform("any")
+    return np.where(
+        has_regular,
+        table["is_regular"],
+        np.where(has_non_medical, non_medical, True),
+    ).astype(bool)
+
+
+def _students_at(table: pd.DataFrame, period_code: str | None) -> pd.Series:
+    if not period_code:
+        return pd.Series(dtype=np.int64)
+    at = table[table["period_code"] == period_code]
+    return at.set_index("code")["total_students"]
+
+
+def _last_where(table: pd.DataFrame, mask: pd.Series, column: str) -> pd.Series:
+    return table[mask].groupby("code", sort=False)[column].last()
+
+
+def _seed_students(
+    table: pd.DataFrame,
+    codes: pd.Index,
+    target_period_code: str | None,
+    cal: AcademicCalendar,
+    is_verano_course: bool,
+) -> pd.Series:
+    if is_verano_course:
+        last_summer = _last_where(table, table["is_summer"], "total_students")
+        return last_summer.reindex(codes, fill_value=0).astype(np.int64)
+
+    last_any = table.groupby("code", sort=False)["total_students"].last()
+    last_regular = _last_where(table, table["is_regular"], "total_students")
+    seed = last_regular.reindex(codes).fillna(last_any.reindex(codes)).fillna(0)
+
+    if target_period_code:
+        base = _students_at(table, cal.seed_period_for_target(target_period_code)).reindex(codes)
+        has_base = base.notna()
+        seed = seed.where(~has_base, base)
+
+        target_info = cal.get(target_period_code)
+        if target_info and target_info.kind == "regular_10":
+            summer = _students_at(
+                table, cal.summer_before_regular(target_period_code)
+            ).reindex(codes)
+            blend = has_base & summer.notna()
+            if blend.any():
+                b = base[blend].to_numpy(dtype=float)
+                s = summer[blend].to_numpy(dtype=float)
+                rate = np.where(b > 0, s / np.maximum(b, 1), 0.35)
+                rate = np.minimum(0.6, np.maximum(0.1, rate))
+                seed[blend] = np.trunc(b + s * rate * 0.5)
+
+    return seed.astype(np.int64)
+
+
+def _summer_rates(table: pd.DataFrame, codes: pd.Index) -> pd.Series:
+    summers = table[table["is_summer"]].groupby("code", sort=False).last()
+    regular = table[table["is_regular"]]
+    if summers.empty or regular.empty:
+        return pd.Series(0.0, index=codes)
+
+    regular = regular[regular["code"].isin(summers.index)]
+    after = regular[regular["period_code"] > regular["code"].map(summers["period_code"])]
+    ref = (
+        after.groupby("code", sort=False)["total_students"].first()
+        .reindex(codes)
+        .fillna(regular.groupby("code", sort=False)["total_students"].last().reindex(codes))
+    )
+    last_summer = summers["total_students"].reindex(codes)
+    valid = last_summer.notna() & ref.notna() & (ref > 0)
+    rate = pd.Series(0.0, index=codes)
+    rate[valid] = np.minimum(
+        0.95, np.maximum(0.05, last_summer[valid].to_numpy(float) / ref[valid].to_numpy(float))
+    )
+    return rate
+
+
+def aggregate_history_frame(
+    frame: pd.DataFrame,
+    *,
+    target_period_code: str | None = None,
+    calendar: AcademicCalendar | None = None,
+    is_verano_course: bool = False,
+) -> dict[str, CourseHistoryStats]:
+    """Vectorized counterpart of aggregate_history_rows over a history_frame()."""
+    if frame.empty:
+        return {}
+    cal = calendar or build_calendar()
+    table = _period_table(frame)
+    # Preserve first-appearance order of courses, as the row engine does
+    codes = pd.Index(pd.unique(frame["code"].astype(object)))
+    by_code = table.groupby("code", sort=False)
+
+    basis = table[_basis_mask(table, is_verano_course)]
+    by_basis = basis.groupby("code", sort=False)
+    avg_sections = by_basis["sections"].mean().reindex(codes, fill_value=0.0)
+    avg_students = by_basis["total_students"].mean().reindex(codes, fill_value=0.0)
+    max_sections = by_code["sections"].max().reindex(codes)
+    num_periods = by_code.size().reindex(codes)
+
+    recent = basis.groupby("code", sort=False).tail(3).groupby("code", sort=False)["total_students"]
+    recent_avg = recent.mean().reindex(codes)
+    recent_n = recent.size().reindex(codes, fill_value=0)
+    estimated_next = np.where(
+        recent_n >= 2, np.round(recent_avg.fillna(0.0)), np.round(avg_students)
+    ).astype(np.int64)
+    est_sections = np.round(estimated_next / STUDENTS_PER_SECTION)
+    est_sections = np.where(est_sections == 0, np.round(avg_sections), est_sections)
+    estimated_next_sections = np.maximum(1, est_sections).astype(np.int64)
+
+    seeds = _seed_students(table, codes, target_period_code, cal, is_verano_course)
+    summer_rates = _summer_rates(table, codes)
+
+    periods_by_code: dict[str, list[PeriodOfferStats]] = {}
+    for row in table.itertuples(index=False):
+        periods_by_code.setdefault(row.code, []).append(
+            PeriodOfferStats(
+                period_code=row.period_code,
+                period_label=row.period_label,
+                sections=int(row.sections),
+                total_students=int(row.total_students),
+                is_summer=bool(row.is_summer),
+                period_kind=row.period_kind,
+            )
+        )
+
+    result: dict[str, CourseHistoryStats] = {}
+    for i, code in enumerate(codes):
+        result[code] = CourseHistoryStats(
+            course_code=code,
+            periods=periods_by_code[code],
+            avg_sections=float(avg_sections.iloc[i]),
+            avg_students=float(avg_students.iloc[i]),
+            max_sections=int(max_sections.iloc[i]),
+            num_periods=int(num_periods.iloc[i]),
+            estimated_next_students=int(estimated_next[i]),
+            estimated_next_sections=int(estimated_next_sections[i]),
+            last_regular_students=int(seeds.iloc[i]),
+            is_verano_course=is_verano_course,
+            summer_to_regular_rate=float(summer_rates.iloc[i]),
+        )
+    return result
+
+
+def compare_history_engines(
+    rows: list[dict],
+    *,
+    target_period_code: str | None = None,
+    calendar: AcademicCalendar | None = None,
+    is_verano_course: bool = False,
+) -> list[str]:
+    """Course codes whose stats differ between the row and columnar engines."""
+    cal = calendar or build_calendar()
+    kwargs = {
+        "target_period_code": target_period_code,
+        "calendar": cal,
+        "is_verano_course": is_verano_course,
+    }
+    expected = aggregate_history_rows(rows, engine="python", **kwargs)
+    actual = aggregate_history_frame(history_frame(rows), **kwargs)
+    mismatched = [code for code in expected if actual.get(code) != expected[code]]
+    mismatched.extend(code for code in actual if code not in expected)
+    if list(expected) != list(actual) and not mismatched:
+        mismatched.append("<order>")
+    return mismatched
+
+
+if __name__ == "__main__":
+    history = load_history_rows()
+    cal = build_calendar()
+    target, _ = cal.infer_target_period(None)
+    for verano in (False, True):
+        diff = compare_history_engines(
+            history, target_period_code=target, calendar=cal, is_verano_course=verano
+        )
+        label = "verano" if verano else "regular"
+        print(f"{label}: {len(diff)} mismatched courses" + (f" {diff[:10]}" if diff else ""))
@@ -2,12 +2,16 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+import sys
+from bisect import bisect_left
+from dataclasses import dataclass, field, replace
 from pathlib import Path
+from typing import Iterator, Literal, Sequence
 
 import pandas as pd
 
-from config import OUTPUT_DIR, STUDENTS_PER_SECTION
+from config import HISTORY_STATS_ENGINE, OUTPUT_DIR, STUDENTS_PER_SECTION
+from data.columnar import iter_table_rows
 from features.codes import normalize_course_code
 from features.period_calendar import (
     AcademicCalendar,
@@ -17,6 +21,10 @@ from features.period_calendar import (
     is_summer_period,
 )
 
+HistoryEngine = Literal["python", "pandas"]
+# The only course_offer_history fields the predictor reads
+HISTORY_COLUMNS = ("course_code", "period_code", "period", "type", "total")
+
 
 @dataclass
 class PeriodOfferStats:
@@ -51,15 +59,219 @@ def _is_usable_for_regular_avg(kind: str) -> bool:
     return is_regular(kind)  # type: ignore[arg-type]
 
 
-def load_history_rows(history_path: Path | None = None) -> list[dict]:
+def iter_history_rows(
+    history_path: Path | None = None, *, columns: Sequence[str] | None = HISTORY_COLUMNS
+) -> Iterator[dict]:
+    """
+    History rows streamed from the export (its Parquet twin when fresh), projected to
+    `columns` (None keeps every field) with repeated strings — codes, periods, types —
+    interned.
+    """
     path = history_path or OUTPUT_DIR / "course_offer_history.json"
-    if not path.exists():
-        return []
-    import json
+    for row in iter_table_rows(path, columns):
+        yield {k: sys.intern(v) if isinstance(v, str) else v for k, v in row.items()}
+
+
+def load_history_rows(
+    history_path: Path | None = None, *, columns: Sequence[str] | None = HISTORY_COLUMNS
+) -> list[dict]:
+    return list(iter_history_rows(history_path, columns=columns))
+
+
+def _row_period_code(row: dict) -> str:
+    return row.get("period_code") or row.get("period") or ""
+
+
+class HistoryIndex:
+    """History rows grouped once by normalized course code."""
+
+    def __init__(self, rows: list[dict], codes: list[str] | None = None) -> None:
+        self.rows = rows
+        self._by_course: dict[str, list[dict]] = {}
+        self._frame: pd.DataFrame | None = None
+        self._group(rows, codes)
+
+    def _group(self, rows: list[dict], codes: list[str] | None) -> None:
+        if codes is None:
+            codes = [normalize_course_code(str(row.get("course_code", ""))) for row in rows]
+        for row, code in zip(rows, codes):
+            self._by_course.setdefault(code, []).append(row)
+
+    def extend(self, rows: list[dict], codes: list[str] | None = None) -> None:
+        """Append `rows` to the index, grouping only them."""
+        self.rows.extend(rows)
+        self._group(rows, codes)
+        self._frame = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def rows_for_course(self, offer_code: str) -> list[dict]:
+        return self._by_course.get(offer_code, [])
+
+    def frame(self) -> pd.DataFrame:
+        """Typed columnar view of the rows, built on first use."""
+        if self._frame is None:
+            from features.history_frame import history_frame
 
-    with open(path, encoding="utf-8") as f:
-        rows = json.load(f)
-    return rows if rows else []
+            self._frame = history_frame(self.rows)
+        return self._frame
+
+    def aggregate(
+        self,
+        *,
+        target_period_code: str | None = None,
+        calendar: AcademicCalendar | None = None,
+        engine: HistoryEngine | None = None,
+    ) -> dict[str, CourseHistoryStats]:
+        """Stats for every course; the pandas engine reuses the cached frame."""
+        if (engine or HISTORY_STATS_ENGINE) == "pandas":
+            from features.history_frame import aggregate_history_frame
+
+            return aggregate_history_frame(
+                self.frame(), target_period_code=target_period_code, calendar=calendar
+            )
+        return aggregate_history_rows(
+            self.rows, target_period_code=target_period_code, calendar=calendar, engine="python"
+        )
+
+
+def build_history_index(rows: list[dict] | None = None) -> HistoryIndex:
+    return HistoryIndex(rows if rows is not None else load_history_rows())
+
+
+class HistoryStore:
+    """
+    History rows stably sorted by period code, with the period column kept alongside so
+    "every row before period X" is a bisect. Course codes are normalized and rows
+    grouped by course once here; every prefix view reuses them.
+    """
+
+    def __init__(self, rows: list[dict]) -> None:
+        keyed = sorted(
+            ((_row_period_code(row), i) for i, row in enumerate(rows)), key=lambda k: k[0]
+        )
+        self.rows = [rows[i] for _, i in keyed]
+        self.periods = [period for period, _ in keyed]
+        normalized: dict[str, str] = {}
+        self.codes: list[str] = []
+        self._by_course: dict[str, list[dict]] = {}
+        self._positions: dict[str, list[int]] = {}
+        for i, row in enumerate(self.rows):
+            raw = str(row.get("course_code", ""))
+            code = normalized.get(raw)
+            if code is None:
+                code = normalized[raw] = normalize_course_code(raw)
+            self.codes.append(code)
+            self._by_course.setdefault(code, []).append(row)
+            self._positions.setdefault(code, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def cut(self, period_code: str | None) -> int:
+        """Number of rows with period < period_code (all rows when None)."""
+        if not period_code:
+            return len(self.rows)
+        return bisect_left(self.periods, period_code)
+
+    def rows_for_course(self, offer_code: str, stop: int | None = None) -> list[dict]:
+        """Rows of one course among the first `stop` rows (all when None)."""
+        rows = self._by_course.get(offer_code)
+        if rows is None:
+            return []
+        if stop is None or stop >= len(self.rows):
+            return rows
+        return rows[: bisect_left(self._positions[offer_code], stop)]
+
+    def before(self, period_code: str | None) -> HistoryView:
+        """Lazy HistoryIndex over the rows before `period_code` (the training prefix)."""
+        return HistoryView(self, self.cut(period_code))
+
+    def index(self) -> HistoryView:
+        return self.before(None)
+
+
+class HistoryView(HistoryIndex):
+    """
+    The first `stop` rows of a HistoryStore as a read-only HistoryIndex. Built in
+    O(1): per-course lookups cut the store's groups by bisect. `rows` is sliced on
+    first use, so aggregate() and frame() still cost O(stop).
+    """
+
+    def __init__(self, store: HistoryStore, stop: int) -> None:
+        self._store = store
+        self._stop = stop
+        self._rows: list[dict] | None = None
+        self._frame = None
+
+    @property
+    def rows(self) -> list[dict]:
+        if self._rows is None:
+            self._rows = self._store.rows[: self._stop]
+        return self._rows
+
+    def extend(self, rows: list[dict], codes: list[str] | None = None) -> None:
+        raise TypeError("HistoryView is read-only; extend a HistoryIndex instead")
+
+    def __len__(self) -> int:
+        return self._stop
+
+    def rows_for_course(self, offer_code: str) -> list[dict]:
+        return self._store.rows_for_course(offer_code, self._stop)
+
+
+def build_history_store(rows: list[dict] | None = None) -> HistoryStore:
+    return HistoryStore(rows if rows is not None else load_history_rows())
+
+
+class PrefixHistoryStats:
+    """
+    Course stats over a growing prefix of a HistoryStore, for rolling-origin backtests.
+    advance_to() groups only the newly included rows; stats() re-derives only courses
+    that received rows and refreshes the target-dependent seed for the rest. Equal to
+    store.before(target).aggregate(target_period_code=target) (regular basis).
+    `index` is the prefix's own HistoryIndex, grown the same way, for per-course row
+    lookups (verano re-aggregation).
+    """
+
+    def __init__(self, store: HistoryStore, calendar: AcademicCalendar | None = None) -> None:
+        self.store = store
+        self.index = HistoryIndex([], [])
+        self._cal = calendar or build_calendar()
+        self._cut = 0
+        self._by_course: dict[str, dict[str, dict]] = {}
+        self._base: dict[str, CourseHistoryStats] = {}
+        self._dirty: set[str] = set()
+
+    def advance_to(self, period_code: str | None) -> None:
+        """Include every row before `period_code`; the prefix can only grow."""
+        cut = self.store.cut(period_code)
+        if cut < self._cut:
+            raise ValueError(f"Prefix already covers rows past {period_code}")
+        rows = self.store.rows[self._cut : cut]
+        codes = self.store.codes[self._cut : cut]
+        self._dirty |= _group_history_rows(rows, self._by_course, codes)
+        self.index.extend(rows, codes)
+        self._cut = cut
+
+    def stats(self, target_period_code: str | None = None) -> dict[str, CourseHistoryStats]:
+        for code in self._dirty:
+            self._base[code] = _course_history_stats(
+                code,
+                self._by_course[code],
+                target_period_code=None,
+                cal=self._cal,
+                is_verano_course=False,
+            )
+        self._dirty.clear()
+
+        result: dict[str, CourseHistoryStats] = {}
+        for code in self._by_course:
+            base = self._base[code]
+            seed = _compute_seed_students(base.periods, target_period_code, self._cal, False)
+            result[code] = replace(base, last_regular_students=seed)
+        return result
 
 
 def aggregate_history_rows(
@@ -68,13 +280,48 @@ def aggregate_history_rows(
     target_period_code: str | None = None,
     calendar: AcademicCalendar | None = None,
     is_verano_course: bool = False,
+    engine: HistoryEngine | None = None,
 ) -> dict[str, CourseHistoryStats]:
+    if (engine or HISTORY_STATS_ENGINE) == "pandas":
+        from features.history_frame import aggregate_history_frame, history_frame
+
+        return aggregate_history_frame(
+            history_frame(rows),
+            target_period_code=target_period_code,
+            calendar=calendar,
+            is_verano_course=is_verano_course,
+        )
+
     per_course_period: dict[str, dict[str, dict]] = {}
+    _group_history_rows(rows, per_course_period)
+
+    cal = calendar or build_calendar()
+    return {
+        course_code: _course_history_stats(
+            course_code,
+            by_period,
+            target_period_code=target_period_code,
+            cal=cal,
+            is_verano_course=is_verano_course,
+        )
+        for course_code, by_period in per_course_period.items()
+    }
 
-    for row in rows:
+
+def _group_history_rows(
+    rows: list[dict],
+    per_course_period: dict[str, dict[str, dict]],
+    codes: list[str] | None = None,
+) -> set[str]:
+    """Add Teoría rows into per-course, per-period sums; returns the course codes touched."""
+    touched: set[str] = set()
+    for i, row in enumerate(rows):
         if row.get("type") != "Teoría":
             continue
-        code = normalize_course_code(str(row.get("course_code", "")))
+        if codes is not None:
+            code = codes[i]
+        else:
+            code = normalize_course_code(str(row.get("course_code", "")))
         period_code = row.get("period_code") or row.get("period") or ""
         period_label = row.get("period") or period_code
         total = float(row.get("total") or 0)
@@ -86,74 +333,78 @@ def aggregate_history_rows(
         )
         current["sections"] += 1
         current["students"] += total
+        touched.add(code)
+    return touched
 
-    cal = calendar or build_calendar()
-    result: dict[str, CourseHistoryStats] = {}
-
-    for course_code, by_period in per_course_period.items():
-        periods: list[PeriodOfferStats] = []
-        for period_code in sorted(by_period.keys()):
-            stats = by_period[period_code]
-            kind = classify_period_kind(period_code)
-            periods.append(
-                PeriodOfferStats(
-                    period_code=period_code,
-                    period_label=stats["label"],
-                    sections=stats["sections"],
-                    total_students=int(stats["students"]),
-                    is_summer=_is_summer(period_code),
-                    period_kind=kind,
-                )
-            )
-
-        if is_verano_course:
-            basis = [p for p in periods if p.period_kind == "summer"]
-            if not basis:
-                basis = periods
-        else:
-            basis = [p for p in periods if _is_usable_for_regular_avg(p.period_kind)]
-            if not basis:
-                basis = [p for p in periods if p.period_kind != "medical_year"]
-            if not basis:
-                basis = periods
-
-        regular = [p for p in periods if _is_usable_for_regular_avg(p.period_kind)]
-        avg_sections = sum(p.sections for p in basis) / len(basis) if basis else 0.0
-        avg_students = sum(p.total_students for p in basis) / len(basis) if basis else 0.0
-        max_sections = max((p.sections for p in periods), default=0)
-
-        recent = [p.total_students for p in basis[-3:]]
-        if len(recent) >= 2:
-            estimated_next_students = round(sum(recent) / len(recent))
-        else:
-            estimated_next_students = round(avg_students)
-
-        estimated_next_sections = max(
-            1,
-            round(estimated_next_students / STUDENTS_PER_SECTION) or round(avg_sections),
-        )
 
-        last_regular_students = _compute_seed_students(
-            periods, target_period_code, cal, is_verano_course
-        )
-
-        summer_rate = _compute_summer_rate(periods, cal)
-
-        result[course_code] = CourseHistoryStats(
-            course_code=course_code,
-            periods=periods,
-            avg_sections=avg_sections,
-            avg_students=avg_students,
-            max_sections=max_sections,
-            num_periods=len(periods),
-            estimated_next_students=estimated_next_students,
-            estimated_next_sections=estimated_next_sections,
-            last_regular_students=last_regular_students,
-            is_verano_course=is_verano_course,
-            summer_to_regular_rate=summer_rate,
+def _course_history_stats(
+    course_code: str,
+    by_period: dict[str, dict],
+    *,
+    target_period_code: str | None,
+    cal: AcademicCalendar,
+    is_verano_course: bool,
+) -> CourseHistoryStats:
+    periods: list[PeriodOfferStats] = []
+    for period_code in sorted(by_period.keys()):
+        stats = by_period[period_code]
+        kind = classify_period_kind(period_code)
+        periods.append(
+            PeriodOfferStats(
+                period_code=period_code,
+                period_label=stats["label"],
+                sections=stats["sections"],
+                total_students=int(stats["students"]),
+                is_summer=_is_summer(period_code),
+                period_kind=kind,
+            )
         )
 
-    return result
+    if is_verano_course:
+        basis = [p for p in periods if p.period_kind == "summer"]
+        if not basis:
+            basis = periods
+    else:
+        basis = [p for p in periods if _is_usable_for_regular_avg(p.period_kind)]
+        if not basis:
+            basis = [p for p in periods if p.period_kind != "medical_year"]
+        if not basis:
+            basis = periods
+
+    avg_sections = sum(p.sections for p in basis) / len(basis) if basis else 0.0
+    avg_students = sum(p.total_students for p in basis) / len(basis) if basis else 0.0
+    max_sections = max((p.sections for p in periods), default=0)
+
+    recent = [p.total_students for p in basis[-3:]]
+    if len(recent) >= 2:
+        estimated_next_students = round(sum(recent) / len(recent))
+    else:
+        estimated_next_students = round(avg_students)
+
+    estimated_next_sections = max(
+        1,
+        round(estimated_next_students / STUDENTS_PER_SECTION) or round(avg_sections),
+    )
+
+    last_regular_students = _compute_seed_students(
+        periods, target_period_code, cal, is_verano_course
+    )
+
+    summer_rate = _compute_summer_rate(periods, cal)
+
+    return CourseHistoryStats(
+        course_code=course_code,
+        periods=periods,
+        avg_sections=avg_sections,
+        avg_students=avg_students,
+        max_sections=max_sections,
+        num_periods=len(periods),
+        estimated_next_students=estimated_next_students,
+        estimated_next_sections=estimated_next_sections,
+        last_regular_students=last_regular_students,
+        is_verano_course=is_verano_course,
+        summer_to_regular_rate=summer_rate,
+    )
 
 
 def _compute_seed_students(
@@ -78,34 +78,62 @@ class AcademicCalendar:
         self._chrono: list[PeriodInfo] = sorted(catalog, key=lambda p: p.code)
         self._regular: list[PeriodInfo] = [p for p in self._chrono if is_regular(p.kind)]
         self._summers: list[PeriodInfo] = [p for p in self._chrono if p.kind == "summer"]
+        self._build_index()
+
+    def _build_index(self) -> None:
+        """Position maps and navigation tables so every lookup below is O(1)."""
+        self._codes: list[str] = [p.code for p in self._chrono]
+        self._regular_codes: list[str] = [p.code for p in self._regular]
+        self._position: dict[str, int] = {}
+        for i, code in enumerate(self._codes):
+            self._position.setdefault(code, i)
+
+        n = len(self._codes)
+        # _next_regular_rank[i]: index in _regular_codes of the first regular after position i
+        self._next_regular_rank: list[int] = [len(self._regular_codes)] * n
+        rank = len(self._regular_codes)
+        for i in range(n - 1, -1, -1):
+            self._next_regular_rank[i] = rank
+            if is_regular(self._by_code[self._codes[i]].kind):
+                rank -= 1
+
+        # _summer_before[i]: latest summer strictly before position i
+        self._summer_before: list[str | None] = [None] * n
+        last_summer: str | None = None
+        for i, code in enumerate(self._codes):
+            self._summer_before[i] = last_summer
+            if self._by_code[code].kind == "summer":
+                last_summer = code
 
     def get(self, code: str) -> PeriodInfo | None:
         return self._by_code.get(code)
 
+    def position(self, code: str) -> int | None:
+        """Chronological index of `code`, or None when it is not in the catalog."""
+        return self._position.get(code)
+
     def all_codes(self) -> list[str]:
-        return [p.code for p in self._chrono]
+        return list(self._codes)
 
     def regular_codes(self) -> list[str]:
-        return [p.code for p in self._regular]
+        return list(self._regular_codes)
 
     def codes_before(self, target_code: str, *, include_target: bool = False) -> list[str]:
-        codes = self.all_codes()
-        if target_code not in self._by_code:
-            return codes
-        idx = codes.index(target_code)
+        idx = self._position.get(target_code)
+        if idx is None:
+            return list(self._codes)
         end = idx + 1 if include_target else idx
-        return codes[:end]
+        return self._codes[:end]
+
+    def _regular_at_rank(self, rank: int) -> str | None:
+        return self._regular_codes[rank] if rank < len(self._regular_codes) else None
 
     def next_regular(self, from_code: str) -> str | None:
         """Next regular semester after from_code (skips summer/medical)."""
-        codes = self.all_codes()
-        if from_code not in self._by_code:
-            return self._regular[-1].code if self._regular else None
-        start = codes.index(from_code) + 1
-        for code in codes[start:]:
-            if is_regular(self._by_code[code].kind):
-                return code
-        return None
+        idx = self._position.get(from_code)
+        if idx is None:
+            return self._regular_codes[-1] if self._regular_codes else None
+        return self._regular_at_rank(self._next_regular_rank[idx])
 
     def advance_regular(self, from_code: str, semester_delta: int) -> str | None:
         """
@@ -115,27 +143,22 @@ class AcademicCalendar:
         """
         if semester_delta <= 0:
             return from_code if from_code in self._by_code else None
-        current = from_code
-        for _ in range(semester_delta):
-            nxt = self.next_regular(current)
-            if not nxt:
+        idx = self._position.get(from_code)
+        if idx is None:
+            # Unknown code: the first step lands on the newest regular
+            if not self._regular_codes:
                 return None
-            current = nxt
-        return current
+            first = len(self._regular_codes) - 1
+        else:
+            first = self._next_regular_rank[idx]
+        return self._regular_at_rank(first + semester_delta - 1)
 
     def summer_before_regular(self, regular_code: str) -> str | None:
         """Summer period immediately before a regular_10 (e.g. 202430 before 202510)."""
-        codes = self.all_codes()
-        if regular_code not in self._by_code:
-            return None
-        info = self._by_code[regular_code]
-        if info.kind != "regular_10":
+        info = self._by_code.get(regular_code)
+        if info is None or info.kind != "regular_10":
             return None
-        idx = codes.index(regular_code)
-        for i in range(idx - 1, -1, -1):
-            if self._by_code[codes[i]].kind == "summer":
-                return codes[i]
-        return None
+        return self._summer_before[self._position[regular_code]]
 
     def infer_target_period(self, current_period_code: str | None) -> tuple[str, str]:
         """
@@ -165,10 +188,9 @@ class AcademicCalendar:
 
     def seed_period_for_target(self, target_code: str) -> str | None:
         """Period whose enrollment seeds prediction for target_code."""
-        if target_code not in self._by_code:
-            return self._regular[-1].code if self._regular else None
-        codes = self.all_codes()
-        idx = codes.index(target_code)
+        idx = self._position.get(target_code)
+        if idx is None:
+            return self._regular_codes[-1] if self._regular_codes else None
         if idx == 0:
             return None
-        return codes[idx - 1]
+        return self._codes[idx - 1]
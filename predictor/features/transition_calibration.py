@@ -7,14 +7,15 @@ from collections import defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Literal
+from typing import Literal, Sequence
+
+import numpy as np
 
 from config import (
+    CALIBRATION_ENGINE,
     CURRICULA_DIR,
     OUTPUT_DIR,
     P_OTHER,
-    P_SAME_AREA,
-    P_SEQUENTIAL,
     PUBLIC_TRANSITION_RATES_JSON,
     TRANSITION_RATE_MAX,
     TRANSITION_RATE_MIN,
@@ -22,48 +23,16 @@ from config import (
     TRANSITION_SHRINKAGE_ALPHA,
 )
 from features.codes import normalize_course_code
-from features.history_stats import aggregate_history_rows, load_history_rows
+from features.history_stats import HistoryStore, aggregate_history_rows, load_history_rows
 from features.period_calendar import AcademicCalendar, build_calendar, is_regular
-from graph.curriculum import iter_curricula, parse_prereq_group
+from graph.curriculum import iter_curricula
 from graph.propagation import (
-    CurriculumGraph,
-    _is_direct_prerequisite,
-    _is_primary_successor,
+    PRIOR_BY_TYPE,
+    EdgeType,
     build_curriculum_graph,
-    default_transition_probability,
 )
 
-EdgeType = Literal["sequential", "cross_area_direct", "same_area", "other", "summer_to_regular"]
-
-PRIOR_BY_TYPE: dict[EdgeType, float] = {
-    "sequential": P_SEQUENTIAL,
-    "cross_area_direct": P_SAME_AREA,
-    "same_area": P_SAME_AREA,
-    "other": P_OTHER,
-    "summer_to_regular": P_SAME_AREA,
-}
-
-
-def classify_edge_type(graph: CurriculumGraph, from_id: str, to_id: str) -> EdgeType:
-    if _is_primary_successor(graph, from_id, to_id):
-        return "sequential"
-    if _is_direct_prerequisite(graph, from_id, to_id):
-        from_c = graph.nodes.get(from_id, {})
-        to_c = graph.nodes.get(to_id, {})
-        if from_c.get("area") != to_c.get("area"):
-            return "cross_area_direct"
-        return "same_area"
-    from_c = graph.nodes.get(from_id, {})
-    to_c = graph.nodes.get(to_id, {})
-    if from_c.get("area") == to_c.get("area"):
-        return "same_area"
-    return "other"
-
-
-def semester_delta(graph: CurriculumGraph, from_id: str, to_id: str) -> int:
-    from_c = graph.nodes.get(from_id, {})
-    to_c = graph.nodes.get(to_id, {})
-    return max(1, int(to_c.get("semester", 0)) - int(from_c.get("semester", 0)))
+CalibrationEngine = Literal["loop", "matrix"]
 
 
 @dataclass
@@ -73,14 +42,6 @@ class RateAccumulator:
     n_pairs: int = 0
 
 
-def _shrink_rate(obs_target: float, obs_source: float, prior: float, alpha: float) -> float:
-    if obs_source <= 0:
-        return prior
-    raw = obs_target / obs_source
-    p = (obs_target + alpha * prior) / (obs_source + alpha)
-    return max(TRANSITION_RATE_MIN, min(TRANSITION_RATE_MAX, p))
-
-
 @dataclass
 class TransitionRateEntry:
     from_id: str
@@ -188,24 +149,60 @@ def _cupo_by_period(history_stats: dict, offer_code: str) -> dict[str, int]:
     return {p.period_code: p.total_students for p in hist.periods}
 
 
+@dataclass
+class CalibrationAccumulators:
+    """Raw period-pair sums behind a TransitionRateTable, before shrinkage."""
+
+    edge: dict[tuple[str, str, str, EdgeType], RateAccumulator] = field(
+        default_factory=lambda: defaultdict(RateAccumulator)
+    )
+    by_type: dict[EdgeType, RateAccumulator] = field(
+        default_factory=lambda: defaultdict(RateAccumulator)
+    )
+    summer: dict[str, RateAccumulator] = field(
+        default_factory=lambda: defaultdict(RateAccumulator)
+    )
+
+
 def calibrate_transitions(
     history_rows: list[dict] | None = None,
     calendar: AcademicCalendar | None = None,
     *,
     max_period: str | None = None,
     alpha: float = TRANSITION_SHRINKAGE_ALPHA,
+    engine: CalibrationEngine | None = None,
+    history_store: HistoryStore | None = None,
 ) -> TransitionRateTable:
     """
     Calibrate edge transition rates from historical period pairs.
     If max_period is set, only pairs with target < max_period are used (for backtest).
+    A `history_store` replaces history_rows and only its rows before max_period are read.
     """
     cal = calendar or build_calendar()
-    stats = aggregate_history_rows(history_rows or load_history_rows())
+    if history_store is not None:
+        stats = history_store.before(max_period).aggregate(calendar=cal)
+    else:
+        stats = aggregate_history_rows(history_rows or load_history_rows())
     history_by_offer = {code: s for code, s in stats.items()}
 
-    edge_acc: dict[tuple[str, str, str, EdgeType], RateAccumulator] = defaultdict(RateAccumulator)
-    type_acc: dict[EdgeType, RateAccumulator] = defaultdict(RateAccumulator)
-    summer_acc: dict[str, RateAccumulator] = defaultdict(RateAccumulator)
+    if (engine or CALIBRATION_ENGINE) == "matrix":
+        from features.calibration_matrix import accumulate_transition_pairs_matrix
+
+        acc = accumulate_transition_pairs_matrix(history_by_offer, cal, max_period=max_period)
+    else:
+        acc = accumulate_transition_pairs(history_by_offer, cal, max_period=max_period)
+    return build_rate_table(acc, alpha)
+
+
+def accumulate_transition_pairs(
+    history_by_offer: dict,
+    cal: AcademicCalendar,
+    *,
+    max_period: str | None = None,
+) -> CalibrationAccumulators:
+    """Loop engine: walk every curriculum edge × regular period pair."""
+    acc = CalibrationAccumulators()
+    edge_acc, type_acc, summer_acc = acc.edge, acc.by_type, acc.summer
 
     regular_codes = [c for c in cal.regular_codes() if not max_period or c < max_period]
 
@@ -214,99 +211,135 @@ def calibrate_transitions(
         if not courses:
             continue
         graph = build_curriculum_graph(courses)
+        edges = graph.edge_table()
+
+        for from_id, to_id in graph.prereq_edges:
+            to_cupo = _cupo_by_period(history_by_offer, normalize_course_code(to_id))
+            from_offer = normalize_course_code(from_id)
+            from_cupo = _cupo_by_period(history_by_offer, from_offer)
+            i = edges.index[(from_id, to_id)]
+            et = edges.edge_type(i)
+            delta = int(edges.semester_delta[i])
+
+            for src_period in regular_codes:
+                tgt_period = cal.advance_regular(src_period, delta)
+                if not tgt_period:
+                    continue
+                if max_period and tgt_period >= max_period:
+                    continue
+                src_students = from_cupo.get(src_period, 0)
+                tgt_students = to_cupo.get(tgt_period, 0)
+                if src_students <= 0:
+                    continue
+
+                key = (from_id, to_id, curriculum_id, et)
+                edge_acc[key].source_students += src_students
+                edge_acc[key].target_students += tgt_students
+                edge_acc[key].n_pairs += 1
+                type_acc[et].source_students += src_students
+                type_acc[et].target_students += tgt_students
+                type_acc[et].n_pairs += 1
+
+            # Summer → next regular_10 for target course
+            for reg_code in regular_codes:
+                if cal.get(reg_code) and cal.get(reg_code).kind != "regular_10":  # type: ignore[union-attr]
+                    continue
+                summer_code = cal.summer_before_regular(reg_code)
+                if not summer_code:
+                    continue
+                if max_period and reg_code >= max_period:
+                    continue
+                src_students = from_cupo.get(summer_code, 0)
+                tgt_students = to_cupo.get(reg_code, 0)
+                if src_students <= 0:
+                    continue
+                summer_acc[from_offer].source_students += src_students
+                summer_acc[from_offer].target_students += tgt_students
+                summer_acc[from_offer].n_pairs += 1
+
+    return acc
+
+
+def _shrink_rates(
+    obs_target: np.ndarray,
+    obs_source: np.ndarray,
+    prior: np.ndarray,
+    alphas: np.ndarray,
+) -> np.ndarray:
+    """
+    Shrinkage toward the prior, (t + α·prior) / (s + α) clipped to the rate bounds,
+    for every (entry, alpha) at once → (entries × alphas); the prior when s = 0.
+    """
+    t, s, pr = obs_target[:, None], obs_source[:, None], prior[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = (t + alphas * pr) / (s + alphas)
+    p = np.minimum(TRANSITION_RATE_MAX, np.maximum(TRANSITION_RATE_MIN, p))
+    return np.where(s > 0, p, pr)
 
-        for course in courses:
-            to_id = course["id"]
-            to_offer = normalize_course_code(to_id)
-            to_cupo = _cupo_by_period(history_by_offer, to_offer)
-
-            for expr in course.get("prerequisites") or []:
-                for from_id in parse_prereq_group(expr):
-                    if from_id not in graph.nodes:
-                        continue
-                    from_offer = normalize_course_code(from_id)
-                    from_cupo = _cupo_by_period(history_by_offer, from_offer)
-                    et = classify_edge_type(graph, from_id, to_id)
-                    delta = semester_delta(graph, from_id, to_id)
-
-                    for src_period in regular_codes:
-                        tgt_period = cal.advance_regular(src_period, delta)
-                        if not tgt_period:
-                            continue
-                        if max_period and tgt_period >= max_period:
-                            continue
-                        src_students = from_cupo.get(src_period, 0)
-                        tgt_students = to_cupo.get(tgt_period, 0)
-                        if src_students <= 0:
-                            continue
-
-                        key = (from_id, to_id, curriculum_id, et)
-                        edge_acc[key].source_students += src_students
-                        edge_acc[key].target_students += tgt_students
-                        edge_acc[key].n_pairs += 1
-                        type_acc[et].source_students += src_students
-                        type_acc[et].target_students += tgt_students
-                        type_acc[et].n_pairs += 1
-
-                    # Summer → next regular_10 for target course
-                    for reg_code in regular_codes:
-                        if cal.get(reg_code) and cal.get(reg_code).kind != "regular_10":  # type: ignore[union-attr]
-                            continue
-                        summer_code = cal.summer_before_regular(reg_code)
-                        if not summer_code:
-                            continue
-                        if max_period and reg_code >= max_period:
-                            continue
-                        src_students = from_cupo.get(summer_code, 0)
-                        tgt_students = to_cupo.get(reg_code, 0)
-                        if src_students <= 0:
-                            continue
-                        summer_acc[from_offer].source_students += src_students
-                        summer_acc[from_offer].target_students += tgt_students
-                        summer_acc[from_offer].n_pairs += 1
-
-    table = TransitionRateTable(
-        generated_at=datetime.now(timezone.utc).isoformat(),
-        version=1,
-    )
-
-    for (from_id, to_id, curriculum_id, et), acc in edge_acc.items():
-        prior = PRIOR_BY_TYPE.get(et, P_OTHER)
-        p = _shrink_rate(acc.target_students, acc.source_students, prior, alpha)
-        table.by_edge[(from_id, to_id)] = TransitionRateEntry(
-            from_id=from_id,
-            to_id=to_id,
-            edge_type=et,
-            p=p,
-            prior=prior,
-            n_pairs=acc.n_pairs,
-            source_students=acc.source_students,
-            target_students=acc.target_students,
-            curriculum_id=curriculum_id,
-        )
 
-    for et, acc in type_acc.items():
-        prior = PRIOR_BY_TYPE.get(et, P_OTHER)
-        p = _shrink_rate(acc.target_students, acc.source_students, prior, alpha)
-        table.by_type[et] = TransitionRateEntry(
-            from_id="*",
-            to_id="*",
-            edge_type=et,
-            p=p,
-            prior=prior,
-            n_pairs=acc.n_pairs,
-            source_students=acc.source_students,
-            target_students=acc.target_students,
-        )
+def build_rate_table(
+    acc: CalibrationAccumulators,
+    alpha: float = TRANSITION_SHRINKAGE_ALPHA,
+) -> TransitionRateTable:
+    """Apply shrinkage toward type priors to accumulated period-pair sums."""
+    return build_rate_tables(acc, [alpha])[0]
+
+
+def build_rate_tables(
+    acc: CalibrationAccumulators,
+    alphas: Sequence[float],
+) -> list[TransitionRateTable]:
+    """One rate table per alpha from the same sums; shrinkage runs over the whole grid."""
+    edge_items = list(acc.edge.items())
+    type_items = list(acc.by_type.items())
+    entries = [e for _, e in edge_items] + [e for _, e in type_items]
+    priors = [PRIOR_BY_TYPE.get(key[3], P_OTHER) for key, _ in edge_items]
+    priors += [PRIOR_BY_TYPE.get(et, P_OTHER) for et, _ in type_items]
+    rates = _shrink_rates(
+        np.array([e.target_students for e in entries], dtype=float),
+        np.array([e.source_students for e in entries], dtype=float),
+        np.array(priors, dtype=float),
+        np.asarray(alphas, dtype=float),
+    )
 
-    for offer, acc in summer_acc.items():
-        if acc.source_students > 0:
-            raw = acc.target_students / acc.source_students
-            table.summer_rates[offer] = round(
+    summer_rates: dict[str, float] = {}
+    for offer, summer in acc.summer.items():
+        if summer.source_students > 0:
+            raw = summer.target_students / summer.source_students
+            summer_rates[offer] = round(
                 max(TRANSITION_RATE_MIN, min(TRANSITION_RATE_MAX, raw)), 4
             )
 
-    return table
+    generated_at = datetime.now(timezone.utc).isoformat()
+    tables: list[TransitionRateTable] = []
+    for j in range(len(alphas)):
+        table = TransitionRateTable(generated_at=generated_at, version=1)
+        for i, ((from_id, to_id, curriculum_id, et), edge) in enumerate(edge_items):
+            table.by_edge[(from_id, to_id)] = TransitionRateEntry(
+                from_id=from_id,
+                to_id=to_id,
+                edge_type=et,
+                p=float(rates[i, j]),
+                prior=priors[i],
+                n_pairs=edge.n_pairs,
+                source_students=edge.source_students,
+                target_students=edge.target_students,
+                curriculum_id=curriculum_id,
+            )
+        for i, (et, type_entry) in enumerate(type_items, start=len(edge_items)):
+            table.by_type[et] = TransitionRateEntry(
+                from_id="*",
+                to_id="*",
+                edge_type=et,
+                p=float(rates[i, j]),
+                prior=priors[i],
+                n_pairs=type_entry.n_pairs,
+                source_students=type_entry.source_students,
+                target_students=type_entry.target_students,
+            )
+        table.summer_rates = dict(summer_rates)
+        tables.append(table)
+    return tables
 
 
 def save_transition_rates(
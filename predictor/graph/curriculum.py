@@ -26,10 +26,14 @@ def parse_prereq_group(expr: str) -> list[str]:
     return [p.strip() for p in expr.split("||") if p.strip()]
 
 
-def build_graph(courses: list[dict]) -> nx.DiGraph:
+def build_graph(
+    courses: list[dict],
+    edges: list[tuple[str, str]] | None = None,
+) -> nx.DiGraph:
     """
     Build a directed graph: edge prereq -> course.
     OR groups become edges from each alternative prerequisite.
+    Pass `edges` (e.g. CurriculumGraph.prereq_edges) to reuse already-parsed prerequisites.
     """
     g = nx.DiGraph()
     course_ids = {c["id"] for c in courses}
@@ -43,11 +47,15 @@ def build_graph(courses: list[dict]) -> nx.DiGraph:
             "type": course.get("type", ""),
             "area": course.get("area", cid[:3]),
         })
+        if edges is not None:
+            continue
         for prereq_expr in course.get("prerequisites", []):
             for prereq in parse_prereq_group(prereq_expr):
                 if prereq in course_ids:
                     g.add_edge(prereq, cid)
 
+    if edges is not None:
+        g.add_edges_from(edges)
     return g
 
 
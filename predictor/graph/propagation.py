@@ -3,21 +3,123 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Literal
 
-from config import MAX_DAG_HOPS, MIN_DAG_FLOW, P_OTHER, P_SAME_AREA, P_SEQUENTIAL
+import numpy as np
+
+from config import (
+    MAX_DAG_HOPS,
+    MIN_DAG_FLOW,
+    P_OTHER,
+    P_SAME_AREA,
+    P_SEQUENTIAL,
+    PROPAGATION_ENGINE,
+)
 from features.codes import normalize_course_code
 from graph.curriculum import parse_prereq_group
 
 if TYPE_CHECKING:
     from features.transition_calibration import TransitionRateTable
+    from graph.propagation_matrix import TransitionMatrix
+
+PropagationEngine = Literal["queue", "matrix"]
+EdgeType = Literal["sequential", "cross_area_direct", "same_area", "other", "summer_to_regular"]
+
+EDGE_TYPES: tuple[EdgeType, ...] = (
+    "sequential",
+    "cross_area_direct",
+    "same_area",
+    "other",
+    "summer_to_regular",
+)
+
+PRIOR_BY_TYPE: dict[EdgeType, float] = {
+    "sequential": P_SEQUENTIAL,
+    "cross_area_direct": P_SAME_AREA,
+    "same_area": P_SAME_AREA,
+    "other": P_OTHER,
+    "summer_to_regular": P_SAME_AREA,
+}
+
+
+@dataclass
+class EdgeTable:
+    """
+    Per-graph edge attributes as arrays, indexed by (from_id, to_id): edge type
+    (code into EDGE_TYPES), semester delta and default prior. `succ_rows` maps each
+    CSR successor edge of the graph to its row. Calibrated probabilities are resolved
+    once per TransitionRateTable and cached.
+    """
+
+    from_ids: list[str]
+    to_ids: list[str]
+    index: dict[tuple[str, str], int]
+    type_code: np.ndarray
+    semester_delta: np.ndarray
+    prior: np.ndarray
+    succ_rows: np.ndarray
+    _probabilities: tuple[object, np.ndarray] | None = field(default=None, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.from_ids)
+
+    def edge_type(self, i: int) -> EdgeType:
+        return EDGE_TYPES[self.type_code[i]]
+
+    def probabilities(self, rates: TransitionRateTable | None = None) -> np.ndarray:
+        """Transition probability per edge: calibrated when `rates` has it, else the prior."""
+        if rates is None:
+            return self.prior
+        if self._probabilities is not None and self._probabilities[0] is rates:
+            return self._probabilities[1]
+        probs = self.prior.copy()
+        for i, (from_id, to_id) in enumerate(zip(self.from_ids, self.to_ids)):
+            calibrated = rates.lookup(from_id, to_id, self.edge_type(i))
+            if calibrated is not None:
+                probs[i] = calibrated
+        self._probabilities = (rates, probs)
+        return probs
 
 
 @dataclass
 class CurriculumGraph:
+    """
+    Course DAG for one malla. Prerequisite strings are parsed once at build time:
+    `prereq_groups` holds OR-groups per course as id tuples, `group_indices` the same
+    groups as node-index tuples (alternatives outside the malla dropped), `prereq_edges`
+    every (prereq, course) occurrence in course order, and `succ_offsets`/`succ_targets`
+    the successor lists in CSR form over `node_ids`.
+    """
+
     nodes: dict[str, dict]
     successors: dict[str, list[str]] = field(default_factory=dict)
     prerequisites: dict[str, list[str]] = field(default_factory=dict)
+    prereq_groups: dict[str, list[tuple[str, ...]]] = field(default_factory=dict)
+    prereq_edges: list[tuple[str, str]] = field(default_factory=list)
+    node_ids: list[str] = field(default_factory=list)
+    node_index: dict[str, int] = field(default_factory=dict)
+    group_indices: list[list[tuple[int, ...]]] = field(default_factory=list)
+    succ_offsets: np.ndarray = field(default_factory=lambda: np.zeros(1, dtype=np.int64))
+    succ_targets: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+    _edges: EdgeTable | None = field(default=None, repr=False, compare=False)
+    _matrices: dict[int, tuple[object, TransitionMatrix]] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+    def edge_table(self) -> EdgeTable:
+        """Edge attributes for every successor and prerequisite edge, built on first use."""
+        if self._edges is None:
+            self._edges = build_edge_table(self)
+        return self._edges
+
+    def transition_matrix(self, rates: TransitionRateTable | None = None) -> TransitionMatrix:
+        """TransitionMatrix (graph/propagation_matrix.py) per rate table, built on first use."""
+        cached = self._matrices.get(id(rates))
+        if cached is None or cached[0] is not rates:
+            from graph.propagation_matrix import build_transition_matrix
+
+            cached = self._matrices[id(rates)] = (rates, build_transition_matrix(self, rates))
+        return cached[1]
 
 
 def build_curriculum_graph(courses: list[dict]) -> CurriculumGraph:
@@ -25,25 +127,55 @@ def build_curriculum_graph(courses: list[dict]) -> CurriculumGraph:
     nodes = {c["id"]: c for c in courses}
     successors: dict[str, list[str]] = {cid: [] for cid in ids}
     prerequisites: dict[str, list[str]] = {}
+    prereq_groups: dict[str, list[tuple[str, ...]]] = {}
+    prereq_edges: list[tuple[str, str]] = []
 
     for course in courses:
         cid = course["id"]
         prereq_exprs = course.get("prerequisites") or []
         prerequisites[cid] = list(prereq_exprs)
-        for expr in prereq_exprs:
-            for prereq in parse_prereq_group(expr):
+        groups = [tuple(parse_prereq_group(expr)) for expr in prereq_exprs]
+        prereq_groups[cid] = groups
+        for group in groups:
+            for prereq in group:
                 if prereq not in ids:
                     continue
                 successors.setdefault(prereq, []).append(cid)
+                prereq_edges.append((prereq, cid))
 
-    return CurriculumGraph(nodes=nodes, successors=successors, prerequisites=prerequisites)
+    node_ids = list(nodes)
+    node_index = {cid: i for i, cid in enumerate(node_ids)}
+    group_indices = [
+        [
+            tuple(node_index[p] for p in group if p in node_index)
+            for group in prereq_groups.get(cid, [])
+        ]
+        for cid in node_ids
+    ]
+    out_degree = [len(successors.get(cid, [])) for cid in node_ids]
+    succ_offsets = np.zeros(len(node_ids) + 1, dtype=np.int64)
+    succ_offsets[1:] = np.cumsum(out_degree)
+    succ_targets = np.array(
+        [node_index[sid] for cid in node_ids for sid in successors.get(cid, [])],
+        dtype=np.int64,
+    )
+
+    return CurriculumGraph(
+        nodes=nodes,
+        successors=successors,
+        prerequisites=prerequisites,
+        prereq_groups=prereq_groups,
+        prereq_edges=prereq_edges,
+        node_ids=node_ids,
+        node_index=node_index,
+        group_indices=group_indices,
+        succ_offsets=succ_offsets,
+        succ_targets=succ_targets,
+    )
 
 
 def _is_direct_prerequisite(graph: CurriculumGraph, from_id: str, to_id: str) -> bool:
-    for expr in graph.prerequisites.get(to_id, []):
-        if from_id in parse_prereq_group(expr):
-            return True
-    return False
+    return any(from_id in group for group in graph.prereq_groups.get(to_id, []))
 
 
 def _is_primary_successor(graph: CurriculumGraph, from_id: str, to_id: str) -> bool:
@@ -68,6 +200,60 @@ def _is_primary_successor(graph: CurriculumGraph, from_id: str, to_id: str) -> b
     return to_id in same_area_next
 
 
+def classify_edge_type(graph: CurriculumGraph, from_id: str, to_id: str) -> EdgeType:
+    if _is_primary_successor(graph, from_id, to_id):
+        return "sequential"
+    if _is_direct_prerequisite(graph, from_id, to_id):
+        from_c = graph.nodes.get(from_id, {})
+        to_c = graph.nodes.get(to_id, {})
+        if from_c.get("area") != to_c.get("area"):
+            return "cross_area_direct"
+        return "same_area"
+    from_c = graph.nodes.get(from_id, {})
+    to_c = graph.nodes.get(to_id, {})
+    if from_c.get("area") == to_c.get("area"):
+        return "same_area"
+    return "other"
+
+
+def semester_delta(graph: CurriculumGraph, from_id: str, to_id: str) -> int:
+    from_c = graph.nodes.get(from_id, {})
+    to_c = graph.nodes.get(to_id, {})
+    return max(1, int(to_c.get("semester", 0)) - int(from_c.get("semester", 0)))
+
+
+def build_edge_table(graph: CurriculumGraph) -> EdgeTable:
+    pairs: dict[tuple[str, str], int] = {}
+    for from_id, succ_ids in graph.successors.items():
+        for to_id in succ_ids:
+            pairs.setdefault((from_id, to_id), len(pairs))
+    for to_id, groups in graph.prereq_groups.items():
+        for group in groups:
+            for from_id in group:
+                if from_id in graph.nodes:
+                    pairs.setdefault((from_id, to_id), len(pairs))
+
+    types = [classify_edge_type(graph, a, b) for a, b in pairs]
+    return EdgeTable(
+        from_ids=[a for a, _ in pairs],
+        to_ids=[b for _, b in pairs],
+        index=pairs,
+        type_code=np.array([EDGE_TYPES.index(t) for t in types], dtype=np.int8),
+        semester_delta=np.array(
+            [semester_delta(graph, a, b) for a, b in pairs], dtype=np.int64
+        ),
+        prior=np.array([PRIOR_BY_TYPE[t] for t in types], dtype=float),
+        succ_rows=np.array(
+            [
+                pairs[(from_id, to_id)]
+                for from_id in graph.node_ids
+                for to_id in graph.successors.get(from_id, [])
+            ],
+            dtype=np.int64,
+        ),
+    )
+
+
 def default_transition_probability(graph: CurriculumGraph, from_id: str, to_id: str) -> float:
     """Fixed priors (80/50/25) — fallback when no calibration data."""
     if from_id not in graph.nodes or to_id not in graph.nodes:
@@ -89,9 +275,11 @@ def transition_probability(
     to_id: str,
     rates: TransitionRateTable | None = None,
 ) -> float:
+    table = graph.edge_table()
+    i = table.index.get((from_id, to_id))
+    if i is not None:
+        return float(table.probabilities(rates)[i])
     if rates is not None:
-        from features.transition_calibration import classify_edge_type
-
         et = classify_edge_type(graph, from_id, to_id)
         calibrated = rates.lookup(from_id, to_id, et)
         if calibrated is not None:
@@ -107,21 +295,27 @@ def _propagate_inflow(
 ) -> dict[str, float]:
     inflow: dict[str, float] = {}
     queue: list[tuple[str, float, int]] = []
+    table = graph.edge_table()
+    edge_index = table.index
+    edge_p = table.probabilities(rates).tolist()
 
     for course_id, course in graph.nodes.items():
-        prereq_exprs = graph.prerequisites.get(course_id, [])
-        if not prereq_exprs:
+        groups = graph.prereq_groups.get(course_id, [])
+        if not groups:
             continue
 
         direct_total = 0.0
-        for expr in prereq_exprs:
-            group = parse_prereq_group(expr)
+        for group in groups:
             group_max = 0.0
             for prereq_id in group:
                 seed = seeds_by_course_id.get(prereq_id, 0.0)
                 if seed <= 0:
                     continue
-                transferred = seed * transition_probability(graph, prereq_id, course_id, rates)
+                i = edge_index.get((prereq_id, course_id))
+                p = edge_p[i] if i is not None else transition_probability(
+                    graph, prereq_id, course_id, rates
+                )
+                transferred = seed * p
                 group_max = max(group_max, transferred)
             direct_total += group_max
 
@@ -135,7 +329,7 @@ def _propagate_inflow(
         if depth >= max_hops:
             continue
         for succ_id in graph.successors.get(node_id, []):
-            transferred = students * transition_probability(graph, node_id, succ_id, rates)
+            transferred = students * edge_p[edge_index[(node_id, succ_id)]]
             if transferred < MIN_DAG_FLOW:
                 continue
             inflow[succ_id] = inflow.get(succ_id, 0.0) + transferred
@@ -163,9 +357,18 @@ def propagate_demand_from_sources(
     cursando_seeds: dict[str, float],
     max_hops: int = MAX_DAG_HOPS,
     rates: TransitionRateTable | None = None,
+    engine: PropagationEngine | None = None,
 ) -> tuple[dict[str, float], dict[str, float], dict[str, float]]:
-    inflow_hist = _propagate_inflow(graph, history_seeds, max_hops, rates)
-    inflow_curs = _propagate_inflow(graph, cursando_seeds, max_hops, rates)
+    if (engine or PROPAGATION_ENGINE) == "matrix":
+        from graph.propagation_matrix import propagate_seed_batch
+
+        batch = propagate_seed_batch(
+            graph, {"history": history_seeds, "cursando": cursando_seeds}, max_hops, rates
+        )
+        inflow_hist, inflow_curs = batch["history"], batch["cursando"]
+    else:
+        inflow_hist = _propagate_inflow(graph, history_seeds, max_hops, rates)
+        inflow_curs = _propagate_inflow(graph, cursando_seeds, max_hops, rates)
     total: dict[str, float] = {}
     for key in set(inflow_hist) | set(inflow_curs):
         total[key] = inflow_hist.get(key, 0.0) + inflow_curs.get(key, 0.0)
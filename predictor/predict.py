@@ -15,18 +15,26 @@ def main() -> None:
     parser = argparse.ArgumentParser(description="Predict course demand")
     parser.add_argument("--faculty", help="Filter by faculty code, e.g. CMP")
     parser.add_argument("--skip-export", action="store_true")
+    parser.add_argument(
+        "--incremental-export",
+        action="store_true",
+        help="Only fetch history/progress rows newer than the stored export watermarks",
+    )
     parser.add_argument("--recalibrate", action="store_true", help="Re-run transition calibration")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Processes for per-curriculum feature building"
+    )
     args = parser.parse_args()
 
     if not args.skip_export:
-        export_all()
+        export_all(incremental=args.incremental_export)
 
     rates = load_transition_rates()
     if args.recalibrate or rates is None:
         rates = calibrate_transitions()
         save_transition_rates(rates)
 
-    features = build_feature_frame(faculty=args.faculty, rates=rates)
+    features = build_feature_frame(faculty=args.faculty, rates=rates, workers=args.workers)
 
     model = None
     model_path = OUTPUT_DIR / "model.pkl"
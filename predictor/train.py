@@ -8,7 +8,8 @@ import pickle
 from config import OUTPUT_DIR
 from data.export import export_all
 from eval.backtest import run_backtest, save_backtest_report
-from features.build import build_feature_frame
+from features.build import build_feature_frame, load_progress_index
+from features.calibration_state import calibrate_transitions_incremental
 from features.transition_calibration import calibrate_transitions, save_transition_rates
 from models.demand import apply_model, save_dashboard_index, save_predictions, train_demand_model
 
@@ -17,27 +18,52 @@ def main() -> None:
     parser = argparse.ArgumentParser(description="Train course demand predictor")
     parser.add_argument("--faculty", help="Filter by faculty code, e.g. CMP")
     parser.add_argument("--skip-export", action="store_true")
+    parser.add_argument(
+        "--incremental-export",
+        action="store_true",
+        help="Only fetch history/progress rows newer than the stored export watermarks",
+    )
     parser.add_argument("--skip-backtest", action="store_true")
     parser.add_argument("--skip-calibration", action="store_true")
+    parser.add_argument(
+        "--incremental-calibration",
+        action="store_true",
+        help="Reuse persisted transition accumulators; only count newly arrived periods",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes for holdout backtests and per-curriculum feature building",
+    )
     args = parser.parse_args()
 
     if not args.skip_export:
-        export_all()
+        export_all(incremental=args.incremental_export)
+
+    # Parsed once, shared by the backtest and the final feature frame
+    progress = load_progress_index()
 
     if not args.skip_calibration:
-        rates = calibrate_transitions()
+        if args.incremental_calibration:
+            rates, incremental = calibrate_transitions_incremental()
+            print(f"Calibration: {'incremental' if incremental else 'full rebuild'}")
+        else:
+            rates = calibrate_transitions()
         cal_path, pub_path = save_transition_rates(rates)
         print(f"Transition rates → {cal_path} (public: {pub_path})")
     else:
         rates = None
 
     if not args.skip_backtest:
-        report = run_backtest()
+        report = run_backtest(progress_index=progress, workers=args.workers)
         bt_path = save_backtest_report(report)
         print(f"Backtest summary: {json.dumps(report.get('summary', {}))}")
         print(f"Backtest report → {bt_path}")
 
-    features = build_feature_frame(faculty=args.faculty, rates=rates)
+    features = build_feature_frame(
+        faculty=args.faculty, rates=rates, progress_index=progress, workers=args.workers
+    )
     model = train_demand_model(features)
     result = apply_model(features, model, prefer_gbr=True)
 
@@ -0,0 +1,41 @@
+-- RPC: user_progress counts per (curriculum, course) for the offline demand predictor.
+-- Replaces downloading every user_progress row: the export transfers one row per
+-- curriculum course instead of one per user. Course codes are returned as stored;
+-- the predictor normalizes them (predictor/features/codes.py).
+
+CREATE OR REPLACE FUNCTION public.get_predictor_platform_counts()
+RETURNS TABLE(
+  curriculum_id TEXT,
+  course_code   TEXT,
+  in_progress   BIGINT,
+  planned       BIGINT
+)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  WITH items AS (
+    SELECT up.curriculum_id, cid AS course_code, 1 AS in_progress, 0 AS planned
+    FROM public.user_progress up,
+         jsonb_array_elements_text(up.in_progress_courses) AS cid
+    WHERE jsonb_typeof(up.in_progress_courses) = 'array'
+    UNION ALL
+    SELECT up.curriculum_id, cid AS course_code, 0 AS in_progress, 1 AS planned
+    FROM public.user_progress up,
+         jsonb_array_elements_text(up.planned_courses) AS cid
+    WHERE jsonb_typeof(up.planned_courses) = 'array'
+  )
+  SELECT
+    i.curriculum_id,
+    i.course_code,
+    SUM(i.in_progress)::bigint AS in_progress,
+    SUM(i.planned)::bigint     AS planned
+  FROM items i
+  GROUP BY i.curriculum_id, i.course_code
+  ORDER BY i.curriculum_id, i.course_code;
+$$;
+
+-- Aggregates every user's progress: predictor export (service_role) only
+REVOKE ALL ON FUNCTION public.get_predictor_platform_counts() FROM PUBLIC;
+REVOKE ALL ON FUNCTION public.get_predictor_platform_counts() FROM anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.get_predictor_platform_counts() TO service_role;